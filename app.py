@@ -1,94 +1,339 @@
 import os
-import re
-import json
-import csv
-import requests
+import click
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
 
 from flask import (
-    Flask, render_template, request, redirect,
-    url_for, flash, session
+    Blueprint, Flask, current_app, render_template, request, redirect,
+    url_for, flash, session, jsonify, Response, stream_with_context
 )
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import joinedload
 from flask_login import (
     LoginManager, login_user, logout_user,
     login_required, current_user
 )
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_mail import Mail, Message
+from flask_mail import Mail
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
-
-from models import db, User, Recipe, Rating
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from models import db, User, Recipe, upgrade_schema, utcnow
+from search import install_search_index, search_recipes
+from leaderboard import install_leaderboard, refresh_leaderboard
+import db_profile
+import outbox
+from outbox import queue_mail
+from passwords import HashingBusy, account_limiter, hasher, ip_limiter
+from utils import import_many, import_recipe
+from bulk import export_ndjson, import_ndjson
+import assets
+import cache
+import compression
+import images
+import instrumentation
+import passwords
+import leaderboard
+import recommend
+import user_cache
+from cache import fragment_cache
+from http_cache import conditional_page, make_etag
+from interactions import (
+    InteractionError, apply_batch, set_favorite, set_rating, user_rating
+)
+from ingredients import (
+    backfill_ingredients, pantry_index, split_amount, suggest_index,
+    sync_recipe_ingredients
+)
 
 load_dotenv()
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Build a dict mapping ingredient names → list of allowed units
-INGREDIENTS_UNITS = {}
-csv_path = os.path.join(basedir, 'data', 'ingredients_units.csv')
-with open(csv_path, newline='', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        INGREDIENTS_UNITS[row['ingredient']] = [
-            u.strip() for u in row['units'].split(',')
-        ]
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(
-    basedir, 'instance/site.db'
-)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-
-# Email config
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_USERNAME')
+# Views and CLI commands live on this blueprint; create_app() builds the app.
+# cli_group=None keeps the commands at the top level (`flask init-db`).
+bp = Blueprint("main", __name__, cli_group=None)
 
-# Extensions
-mail = Mail(app)
-db.init_app(app)
-serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'])
+mail = Mail()
 
 login_manager = LoginManager()
-login_manager.login_view = 'login'
-login_manager.init_app(app)
+login_manager.login_view = 'main.login'
+
+
+def create_app(config=None):
+    """
+    Build and configure the Flask app. `config` overrides the settings read
+    from the environment, e.g. create_app({"MAIL_OUTBOX_WORKERS": 0}).
+    """
+    app = Flask(__name__)
+    # Database: DATABASE_URL overrides the bundled SQLite file. DB_PROFILE=production
+    # turns on WAL, busy_timeout and a tuned pool; DB_READ_REPLICA=1 also sends
+    # GET-request reads through a read-only engine.
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
+        'DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'instance/site.db')
+    )
+    app.config['DB_PROFILE'] = os.getenv('DB_PROFILE', 'default')
+    app.config['DB_READ_REPLICA'] = os.getenv('DB_READ_REPLICA') == '1'
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+
+    # Email config. Locally, point MAIL_SERVER/MAIL_PORT at `flask mail-sink`
+    # and set MAIL_USE_TLS=0: the sink does not offer STARTTLS
+    app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', '1') == '1'
+    app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
+    app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
+    app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_USERNAME')
+    # Threads draining the email outbox; 0 leaves it to `flask drain-outbox`
+    app.config['MAIL_OUTBOX_WORKERS'] = int(os.getenv('MAIL_OUTBOX_WORKERS', 2))
+
+    # Rendered fragments kept per worker (0 disables), plus an optional SQLite
+    # file shared by all workers on the host
+    app.config['FRAGMENT_CACHE_SIZE'] = int(os.getenv('FRAGMENT_CACHE_SIZE', 2048))
+    app.config['FRAGMENT_CACHE_SHARED'] = os.getenv('FRAGMENT_CACHE_SHARED')
+
+    # Local copies of recipe images: where the variants go, and threads
+    # fetching them (0 leaves it to `flask fetch-images`)
+    app.config['MEDIA_DIR'] = os.getenv('MEDIA_DIR', os.path.join(basedir, 'static/media'))
+    app.config['IMAGE_WORKERS'] = int(os.getenv('IMAGE_WORKERS', 2))
+
+    # Logged-in users are served from a per-worker snapshot cache (0 disables)
+    app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', 10000))
+    app.config['USER_CACHE_TTL']  = int(os.getenv('USER_CACHE_TTL', 60))
+
+    # Password hashing: Werkzeug method string (its cost), pool processes
+    # (0 hashes on the request thread), how many hashes may wait and how
+    # long a request waits for one (seconds) before answering 503
+    app.config['PASSWORD_HASH_METHOD']  = os.getenv('PASSWORD_HASH_METHOD', passwords.DEFAULT_METHOD)
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_QUEUE']   = int(os.getenv('PASSWORD_HASH_QUEUE', 16))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_TIMEOUT', passwords.HASH_TIMEOUT))
+    # Login throttling per worker: failed logins (and registrations) per
+    # client address and failed logins per account within the window (0
+    # disables either)
+    app.config['LOGIN_FAILURES_PER_IP']      = int(os.getenv('LOGIN_FAILURES_PER_IP', 30))
+    app.config['LOGIN_FAILURES_PER_ACCOUNT'] = int(os.getenv('LOGIN_FAILURES_PER_ACCOUNT', 5))
+    app.config['LOGIN_THROTTLE_WINDOW']      = int(os.getenv('LOGIN_THROTTLE_WINDOW', 300))
+    # Reverse proxies in front of the app. Set it to their number, or every
+    # client shares the proxy's address (and its throttle). X-Forwarded-For
+    # and -Proto are only trusted from that many hops.
+    app.config['TRUSTED_PROXIES'] = int(os.getenv('TRUSTED_PROXIES', 0))
+
+    # gzip for dynamic text responses of at least COMPRESS_MIN_SIZE bytes
+    # (COMPRESS_LEVEL 0 leaves it to a proxy); static files are built and
+    # precompressed ahead of time by `flask build-assets`
+    app.config['COMPRESS_LEVEL']    = int(os.getenv('COMPRESS_LEVEL', 6))
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+
+    # Per-request timing: Server-Timing header, /metrics and a slow-request log.
+    # Off by default, and /metrics is a 404 then
+    app.config['PERF_INSTRUMENTATION'] = os.getenv('PERF_INSTRUMENTATION') == '1'
+    app.config['PERF_SLOW_REQUEST_MS'] = int(os.getenv('PERF_SLOW_REQUEST_MS', 500))
+
+    app.config.from_mapping(config or {})
+    db_profile.configure(app)
+
+    if app.config['TRUSTED_PROXIES']:
+        hops = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    # Extensions
+    mail.init_app(app)
+    db.init_app(app)
+    db_profile.install(app, db)
+    outbox.init_app(app, mail)
+    cache.init_app(app)
+    images.init_app(app)
+    user_cache.init_app(app)
+    passwords.init_app(app)
+    assets.init_app(app)
+    instrumentation.init_app(app, db)
+    compression.init_app(app)
+    login_manager.init_app(app)
+
+    app.register_blueprint(bp)
+    return app
+
+
+def __getattr__(name):
+    # `from app import app` and `flask --app app` get an app built on first
+    # access, so importing this module alone stays cheap
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def refuse(template, message, status, retry_after, **context):
+    """Re-render a form with `message` and a Retry-After header."""
+    return (
+        render_template(template, message=message, **context),
+        status,
+        {"Retry-After": str(retry_after)}
+    )
+
+
+def serializer():
+    """Signs email-confirmation and password-reset tokens."""
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+
+
+# Keyset pagination: pages are cut on descending recipe id, never OFFSET
+FEED_PAGE_SIZE = 24
+MAX_PAGE_SIZE  = 100
+# Search results are ranked, so they page by number; cap how deep one can go
+MAX_SEARCH_PAGE = 50
+MAX_SUGGESTIONS = 25
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """A cached UserSnapshot, not a User row; see user_cache.py."""
+    return user_cache.user_cache.load(int(user_id), user_cache.session_stamp())
+
+
+@bp.app_template_global()
+def recipe_card(recipe):
+    """Feed card for `recipe`, rendered once per recipe version."""
+    return fragment_cache.fetch(
+        "card", recipe.id, recipe.version,
+        lambda: render_template("_recipe_card.html", recipe=recipe)
+    )
+
+
+@bp.app_template_global()
+def recipe_image(recipe, variant="thumb"):
+    """Local image of a recipe ("thumb" or "hero"), or the placeholder."""
+    return images.image_url(recipe, variant)
+
+
+@bp.app_template_global()
+def asset_url(filename):
+    """URL of a static file under its fingerprinted name once built; see assets.py."""
+    return assets.asset_url(filename)
+
+
+@bp.app_template_global()
+def recipe_body(recipe):
+    """Hero, ingredients and method of a recipe page, cached per version."""
+    return fragment_cache.fetch(
+        "page", recipe.id, recipe.version,
+        lambda: render_template("_recipe_body.html", recipe=recipe)
+    )
+
+
+def keyset_page(query, before=None, per_page=FEED_PAGE_SIZE):
+    """
+    Return (recipes, next_cursor) for one page of `query`, newest first.
+    `before` is the cursor from the previous page: only recipes with a
+    smaller id are returned. next_cursor is None on the last page.
+    """
+    if before is not None:
+        query = query.filter(Recipe.id < before)
+    rows = query.order_by(Recipe.id.desc()).limit(per_page + 1).all()
+    if len(rows) > per_page:
+        return rows[:per_page], rows[per_page - 1].id
+    return rows, None
+
+
+def public_feed_page(before=None, per_page=FEED_PAGE_SIZE):
+    """One page of the public feed, with authors eager-loaded."""
+    query = (
+        Recipe.query
+        .options(joinedload(Recipe.user))
+        .filter_by(is_public=True)
+    )
+    return keyset_page(query, before, per_page)
+
+
+def recipe_summary(recipe):
+    """JSON shape of a recipe card; the author must be loaded."""
+    return {
+        "id":             recipe.id,
+        "title":          recipe.title,
+        "author":         recipe.user.username,
+        "image":          recipe.image,
+        "thumbnail":      recipe_image(recipe),
+        "average_rating": recipe.average_rating,
+        "rating_count":   recipe.rating_count,
+        "url":            url_for("main.view_recipe", recipe_id=recipe.id),
+    }
+
+
+def render_feed():
+    before = request.args.get("before", type=int)
+
+    # Validator: ids and versions of exactly the rows this page will show,
+    # read from the (is_public, id) index without touching authors
+    keys = db.session.query(Recipe.id, Recipe.version).filter(Recipe.is_public.is_(True))
+    if before is not None:
+        keys = keys.filter(Recipe.id < before)
+    keys = keys.order_by(Recipe.id.desc()).limit(FEED_PAGE_SIZE + 1).all()
+    favorite_ids = getattr(current_user, "favorite_ids", frozenset())
+    etag = make_etag(
+        request.endpoint, before,
+        *(f"{i}.{v}{'*' if i in favorite_ids else ''}" for i, v in keys)
+    )
+
+    def render():
+        recipes, next_cursor = public_feed_page(before)
+        next_url = (
+            url_for(request.endpoint, before=next_cursor) if next_cursor else None
+        )
+        return render_template(
+            "recipes.html",
+            recipes=recipes,
+            next_url=next_url
+        )
+
+    return conditional_page(etag, render)
 
 
-@app.route("/")
+@bp.route("/")
 def home():
-    """Public landing: all public recipes."""
-    public_recipes = Recipe.query.filter_by(is_public=True).all()
-    return render_template("recipes.html", recipes=public_recipes)
+    """Public landing: newest public recipes."""
+    return render_feed()
 
 
-@app.route("/profile")
+@bp.route("/profile")
 @login_required
 def profile():
     """Your dashboard / profile page."""
-    user_recipes     = Recipe.query.filter_by(user_id=current_user.id).all()
-    favorite_recipes = current_user.favorites.all()
+    user_recipes, recipes_cursor = keyset_page(
+        Recipe.query.filter_by(user_id=current_user.id),
+        request.args.get("recipes_before", type=int)
+    )
+    # favorite ids come with the cached user: the page is a primary-key read.
+    # The cursor follows the id list, not the rows found: a snapshot may
+    # still list a deleted recipe, which must not end the pagination.
+    favorites_before = request.args.get("favorites_before", type=int)
+    favorite_ids = sorted(
+        (i for i in current_user.favorite_ids
+         if favorites_before is None or i < favorites_before),
+        reverse=True
+    )
+    page_ids = favorite_ids[:FEED_PAGE_SIZE]
+    favorites_cursor = page_ids[-1] if len(favorite_ids) > FEED_PAGE_SIZE else None
+    favorite_recipes = (
+        Recipe.query.filter(Recipe.id.in_(page_ids)).order_by(Recipe.id.desc()).all()
+        if page_ids else []
+    )
     return render_template(
         "dashboard.html",
         recipes=user_recipes,
-        favorites=favorite_recipes
+        favorites=favorite_recipes,
+        recipes_cursor=recipes_cursor,
+        favorites_cursor=favorites_cursor
     )
 
 
-@app.route("/register", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     message = ""
     if request.method == "POST":
         username = request.form["username"]
         email    = request.form["email"]
         password = request.form["password"]
+        wait = ip_limiter.retry_after(request.remote_addr)
+        if wait:
+            return refuse("register.html", "Too many attempts. Please try again later.", 429, wait)
+        ip_limiter.hit(request.remote_addr)
         existing = User.query.filter(
             (User.username == username) | (User.email == email)
         ).first()
@@ -96,7 +341,10 @@ def register():
         if existing:
             message = "Username or email already exists."
         else:
-            hashed_pw = generate_password_hash(password)
+            try:
+                hashed_pw = hasher.hash_password(password)
+            except HashingBusy:
+                return refuse("register.html", "We're busy right now. Please try again.", 503, 1)
             new_user  = User(
                 username=username,
                 email=email,
@@ -104,16 +352,17 @@ def register():
                 is_verified=False
             )
             db.session.add(new_user)
-            db.session.commit()
 
-            token = serializer.dumps(email, salt='email-confirm')
-            link  = url_for('confirm_email', token=token, _external=True)
-            msg   = Message(
+            token = serializer().dumps(email, salt='email-confirm')
+            link  = url_for('main.confirm_email', token=token, _external=True)
+            queue_mail(
                 "Confirm your Recipe Club email",
-                recipients=[email]
+                [email],
+                f"Click the link to verify your account: {link}"
             )
-            msg.body = f"Click the link to verify your account: {link}"
-            mail.send(msg)
+            # user and confirmation email are committed together
+            db.session.commit()
+            current_app.extensions["outbox"].wake()
 
             return (
                 "Please check your email to verify your account. "
@@ -123,10 +372,10 @@ def register():
     return render_template("register.html", message=message)
 
 
-@app.route("/confirm/<token>")
+@bp.route("/confirm/<token>")
 def confirm_email(token):
     try:
-        email = serializer.loads(token, salt='email-confirm', max_age=3600)
+        email = serializer().loads(token, salt='email-confirm', max_age=3600)
     except (SignatureExpired, BadSignature):
         return "The confirmation link is invalid or/or has expired."
 
@@ -135,37 +384,63 @@ def confirm_email(token):
         return "Account already verified."
     user.is_verified = True
     db.session.commit()
+    user_cache.user_cache.invalidate(user.id)
     return "Your account has been verified. You can now log in."
 
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     message = ""
     if request.method == "POST":
         email    = request.form["email"]
         password = request.form["password"]
-        user     = User.query.filter_by(email=email).first()
+        account  = email.strip().lower()
+        # refused before any hashing, so a flood costs no CPU; only failures
+        # count, so successful logins from one address never lock it out
+        wait = max(
+            ip_limiter.retry_after(request.remote_addr),
+            account_limiter.retry_after(account)
+        )
+        if wait:
+            return refuse(
+                "login.html", f"Too many login attempts. Try again in {wait} seconds.", 429, wait
+            )
+        user = User.query.filter_by(email=email).first()
 
-        if user and check_password_hash(user.password, password):
+        try:
+            ok, new_hash = (
+                hasher.verify_password(user.password, password) if user else (False, None)
+            )
+        except HashingBusy:
+            return refuse("login.html", "We're busy right now. Please try again.", 503, 1)
+
+        if ok:
+            account_limiter.reset(account)
+            if new_hash:
+                # stored with older cost parameters: upgrade it now
+                user.password = new_hash
+                db.session.commit()
             if not user.is_verified:
                 message = "Please verify your email before logging in."
             else:
                 login_user(user)
-                return redirect(url_for("profile"))
+                return redirect(url_for("main.profile"))
         else:
+            ip_limiter.hit(request.remote_addr)
+            account_limiter.hit(account)
             message = "Invalid email or password."
 
     return render_template("login.html", message=message)
 
 
-@app.route("/logout")
+@bp.route("/logout")
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for("login"))
+    return redirect(url_for("main.login"))
 
 
-@app.route("/upload", methods=["GET", "POST"])
+@bp.route("/upload", methods=["GET", "POST"])
 @login_required
 def upload():
     message = None
@@ -191,24 +466,27 @@ def upload():
             image        = image_url
         )
         db.session.add(new_recipe)
+        db.session.flush()
+        sync_recipe_ingredients(new_recipe)
+        images.queue_images([image_url])
         db.session.commit()
+        current_app.extensions["images"].wake()
+        recommend.update_recipe(new_recipe.id)
 
         flash("Recipe uploaded!", "success")
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
 
     # GET: render with any leftover prefill (title/ings/steps/image)  
     prefill = session.get("prefill_data")
     return render_template(
         "upload_recipe.html",
-        ingredients_list = list(INGREDIENTS_UNITS.keys()),
-        units_map        = INGREDIENTS_UNITS,
-        prefill          = prefill,
-        message          = message
+        prefill = prefill,
+        message = message
     )
 
 
 
-@app.route("/upload-from-url", methods=["POST"])
+@bp.route("/upload-from-url", methods=["POST"])
 @login_required
 def upload_from_url():
     url = request.form["recipe_url"].strip()
@@ -217,127 +495,189 @@ def upload_from_url():
     # Only Jamie Oliver for this demo
     if "jamieoliver.com" not in url:
         flash("Currently only JamieOliver.com recipes are supported.", "warning")
-        return redirect(url_for("upload"))
-
-    resp = requests.get(url)
-    soup = BeautifulSoup(resp.text, "html.parser")
-    data = None
-
-    # Grab JSON-LD <script> blocks
-    for tag in soup.find_all("script", type="application/ld+json"):
-        try:
-            jd = json.loads(tag.string)
-            if isinstance(jd, list):
-                # sometimes it's an array
-                jd = next((x for x in jd if x.get("@type") == "Recipe"), None)
-            if jd and jd.get("@type") == "Recipe":
-                data = jd
-                break
-        except Exception:
-            continue
+        return redirect(url_for("main.upload"))
 
-    if not data:
+    data = import_recipe(url)
+    if not data or not data["ingredients"]:
         flash("Couldn’t find recipe data on that page.", "danger")
-        return redirect(url_for("upload"))
-
-    # Title & image
-    title = data.get("name", "")
-    image = data.get("image")
-    if isinstance(image, list):
-        image = image[0]
-
-    # Ingredients: just flat strings
-    raw_ings = data.get("recipeIngredient", [])
-    ingredients = [i.strip() for i in raw_ings]
-
-    # Instructions: handle list-of-objects or single string
-    raw_instr = data.get("recipeInstructions", [])
-    instructions = []
-    if isinstance(raw_instr, list):
-        for step in raw_instr:
-            if isinstance(step, dict) and step.get("text"):
-                instructions.append(step["text"].strip())
-            else:
-                instructions.append(str(step).strip())
-    else:
-        # fallback: split single string on “. ”
-        text = str(raw_instr)
-        for sentence in text.split(". "):
-            s = sentence.strip()
-            if s:
-                if not s.endswith("."):
-                    s += "."
-                instructions.append(s)
+        return redirect(url_for("main.upload"))
 
     prefill = {
-        "title": title,
-        "image": image,
-        "ingredients": ingredients,
-        "instructions": instructions
+        "title": data["title"],
+        "image": data["image"],
+        "ingredients": data["ingredients"],
+        "instructions": data["instructions"]
     }
     session["prefill_data"] = prefill
     flash("Imported from Jamie Oliver! Adjust below then hit Upload.", "success")
-    return redirect(url_for("upload"))
+    return redirect(url_for("main.upload"))
 
 
-@app.route("/recipes")
+@bp.route("/recipes")
 def recipes():
-    public_recipes = Recipe.query.filter_by(is_public=True).all()
-    return render_template("recipes.html", recipes=public_recipes)
+    return render_feed()
+
+
+@bp.route("/api/recipes")
+def api_recipes():
+    """JSON page of the public feed; pass next_cursor back as ?before=."""
+    per_page = min(
+        request.args.get("limit", FEED_PAGE_SIZE, type=int), MAX_PAGE_SIZE
+    )
+    recipes, next_cursor = public_feed_page(
+        request.args.get("before", type=int), max(per_page, 1)
+    )
+    return jsonify({
+        "recipes":     [recipe_summary(r) for r in recipes],
+        "next_cursor": next_cursor,
+    })
+
+
+def search_page_args():
+    q    = request.args.get("q", "").strip()
+    page = min(max(request.args.get("page", 1, type=int), 1), MAX_SEARCH_PAGE)
+    return q, page
+
+
+@bp.route("/search")
+def search():
+    """bm25-ranked full-text search over public recipes."""
+    q, page = search_page_args()
+    results, has_next = search_recipes(q, page, FEED_PAGE_SIZE)
+    next_url = (
+        url_for("main.search", q=q, page=page + 1)
+        if has_next and page < MAX_SEARCH_PAGE else None
+    )
+    return render_template(
+        "recipes.html",
+        recipes=results,
+        next_url=next_url,
+        query=q
+    )
+
 
+@bp.route("/api/search")
+def api_search():
+    q, page = search_page_args()
+    results, has_next = search_recipes(q, page, FEED_PAGE_SIZE)
+    return jsonify({
+        "recipes":   [recipe_summary(r) for r in results],
+        "next_page": page + 1 if has_next and page < MAX_SEARCH_PAGE else None,
+    })
 
-@app.route("/favorite/<int:recipe_id>", methods=["POST"])
+
+@bp.route("/favorite/<int:recipe_id>", methods=["POST"])
 @login_required
 def favorite(recipe_id):
-    recipe = Recipe.query.get_or_404(recipe_id)
-    if recipe not in current_user.favorites:
-        current_user.favorites.append(recipe)
-        db.session.commit()
-    return redirect(request.referrer or url_for("home"))
+    try:
+        set_favorite(current_user.id, recipe_id, True)
+    except InteractionError as e:
+        return str(e), e.status
+    db.session.commit()
+    user_cache.mark_changed(current_user.id)
+    recommend.invalidate_user(current_user.id)
+    return redirect(request.referrer or url_for("main.home"))
 
 
-@app.route("/unfavorite/<int:recipe_id>", methods=["POST"])
+@bp.route("/unfavorite/<int:recipe_id>", methods=["POST"])
 @login_required
 def unfavorite(recipe_id):
-    recipe = Recipe.query.get_or_404(recipe_id)
-    if recipe in current_user.favorites:
-        current_user.favorites.remove(recipe)
-        db.session.commit()
-    return redirect(request.referrer or url_for("home"))
+    try:
+        set_favorite(current_user.id, recipe_id, False)
+    except InteractionError as e:
+        return str(e), e.status
+    db.session.commit()
+    user_cache.mark_changed(current_user.id)
+    recommend.invalidate_user(current_user.id)
+    return redirect(request.referrer or url_for("main.home"))
 
 
-@app.route("/rate/<int:recipe_id>", methods=["POST"])
+@bp.route("/rate/<int:recipe_id>", methods=["POST"])
 @login_required
 def rate_recipe(recipe_id):
-    recipe = Recipe.query.get_or_404(recipe_id)
-    if recipe.user_id == current_user.id:
-        return "You can't rate your own recipe.", 403
-
-    score = int(request.form["score"])
-    existing = Rating.query.filter_by(
-        user_id=current_user.id,
-        recipe_id=recipe_id
-    ).first()
-    if existing:
-        existing.score = score
-    else:
-        new_rating = Rating(
-            score=score,
-            user_id=current_user.id,
-            recipe_id=recipe_id
-        )
-        db.session.add(new_rating)
+    try:
+        set_rating(current_user.id, recipe_id, request.form.get("score", type=int))
+    except InteractionError as e:
+        return str(e), e.status
     db.session.commit()
-    return redirect(request.referrer or url_for("recipes"))
+    fragment_cache.invalidate_recipe(recipe_id)
+    recommend.invalidate_user(current_user.id)
+    return redirect(request.referrer or url_for("main.recipes"))
 
 
-@app.route("/recipe/<int:recipe_id>")
+@bp.route("/api/interactions", methods=["POST"])
+@login_required
+def api_interactions():
+    """
+    Batch favorite/rating changes without a page reload:
+    {"favorites": {"12": true, "15": false}, "ratings": {"12": 4}}
+    """
+    try:
+        results, errors, touched = apply_batch(
+            current_user.id, request.get_json(silent=True)
+        )
+    except InteractionError as e:
+        return jsonify({"error": str(e)}), e.status
+    db.session.commit()
+    for recipe_id in touched:
+        fragment_cache.invalidate_recipe(recipe_id)
+    if touched:
+        recommend.invalidate_user(current_user.id)
+    if results["favorites"]:
+        user_cache.mark_changed(current_user.id)
+
+    rated = {int(k) for k in results["ratings"]}
+    aggregates = {
+        str(r.id): {"average_rating": r.average_rating, "rating_count": r.rating_count}
+        for r in Recipe.query.filter(Recipe.id.in_(rated))
+    } if rated else {}
+    return jsonify({
+        "favorites":  results["favorites"],
+        "ratings":    results["ratings"],
+        "aggregates": aggregates,
+        "errors":     {k: v for k, v in errors.items() if v},
+    })
+
+
+@bp.route("/recipe/<int:recipe_id>")
 def view_recipe(recipe_id):
-    recipe = Recipe.query.get_or_404(recipe_id)
-    return render_template("view_recipe.html", recipe=recipe, request=request)
+    version, updated_at = (
+        db.session.query(Recipe.version, Recipe.updated_at)
+        .filter_by(id=recipe_id)
+        .first_or_404()
+    )
 
+    favorited = None
+    if current_user.is_authenticated:
+        favorited = recipe_id in current_user.favorite_ids
+    # the viewer's own rating needs no part here: rating bumps the version
+    similar_keys = recommend.similar_keys(recipe_id)
+
+    def render():
+        recipe = Recipe.query.get_or_404(recipe_id)
+        my_score = None
+        if current_user.is_authenticated:
+            my_score = user_rating(current_user.id, recipe_id)
+        return render_template(
+            "view_recipe.html",
+            recipe=recipe,
+            request=request,
+            favorited=favorited,
+            my_score=my_score,
+            similar=recommend.similar_recipes(recipe_id)
+        )
 
-@app.route("/delete/<int:recipe_id>", methods=["POST"])
+    return conditional_page(
+        make_etag(
+            "recipe", recipe_id, version, favorited,
+            *(f"{i}.{v}" for i, v in similar_keys)
+        ),
+        render,
+        updated_at
+    )
+
+
+@bp.route("/delete/<int:recipe_id>", methods=["POST"])
 @login_required
 def delete_recipe(recipe_id):
     recipe = Recipe.query.get_or_404(recipe_id)
@@ -345,10 +685,13 @@ def delete_recipe(recipe_id):
         return "Unauthorized", 403
     db.session.delete(recipe)
     db.session.commit()
-    return redirect(url_for("profile"))
+    pantry_index.remove_recipe(recipe_id)
+    fragment_cache.invalidate_recipe(recipe_id)
+    recommend.remove_recipe(recipe_id)
+    return redirect(url_for("main.profile"))
 
 
-@app.route("/edit/<int:recipe_id>", methods=["GET", "POST"])
+@bp.route("/edit/<int:recipe_id>", methods=["GET", "POST"])
 @login_required
 def edit_recipe(recipe_id):
     recipe = Recipe.query.get_or_404(recipe_id)
@@ -360,48 +703,340 @@ def edit_recipe(recipe_id):
         recipe.ingredients  = request.form["ingredients"]
         recipe.instructions = request.form["instructions"]
         recipe.is_public    = "is_public" in request.form
+        recipe.version      = Recipe.version + 1
+        recipe.updated_at   = utcnow()
+        sync_recipe_ingredients(recipe)
         db.session.commit()
-        return redirect(url_for("profile"))
+        fragment_cache.invalidate_recipe(recipe_id)
+        recommend.update_recipe(recipe_id)
+        return redirect(url_for("main.profile"))
 
     return render_template("edit_recipe.html", recipe=recipe)
 
 
-@app.route("/forgot-password", methods=["GET", "POST"])
+@bp.route("/api/cache-stats")
+def cache_stats():
+    """Fragment and user cache hit/miss counters for this worker."""
+    return jsonify(dict(fragment_cache.stats(), users=user_cache.user_cache.stats()))
+
+
+@bp.route("/export.ndjson")
+@login_required
+def export_data():
+    """Stream your recipes, ratings and favorites as NDJSON."""
+    return Response(
+        stream_with_context(export_ndjson(user_id=current_user.id)),
+        mimetype="application/x-ndjson",
+        headers={
+            "Content-Disposition": "attachment; filename=recipe-club-export.ndjson"
+        }
+    )
+
+
+@bp.route("/forgot-password", methods=["GET", "POST"])
 def forgot_password():
     message = ""
     if request.method == "POST":
         email = request.form["email"]
         user  = User.query.filter_by(email=email).first()
         if user:
-            token = serializer.dumps(email, salt='password-reset')
-            link  = url_for('reset_password', token=token, _external=True)
-            msg   = Message("Password Reset for Recipe Club",
-                            recipients=[email])
-            msg.body = f"Click the link to reset your password: {link}"
-            mail.send(msg)
+            token = serializer().dumps(email, salt='password-reset')
+            link  = url_for('main.reset_password', token=token, _external=True)
+            queue_mail(
+                "Password Reset for Recipe Club",
+                [email],
+                f"Click the link to reset your password: {link}"
+            )
+            db.session.commit()
+            current_app.extensions["outbox"].wake()
             message = "Check your email for a password reset link."
         else:
             message = "No account found with that email."
     return render_template("forgot_password.html", message=message)
 
 
-@app.route("/reset-password/<token>", methods=["GET", "POST"])
+@bp.route("/reset-password/<token>", methods=["GET", "POST"])
 def reset_password(token):
     try:
-        email = serializer.loads(token, salt='password-reset', max_age=3600)
+        email = serializer().loads(token, salt='password-reset', max_age=3600)
     except (SignatureExpired, BadSignature):
         return "The password reset link is invalid or has expired."
 
     user = User.query.filter_by(email=email).first_or_404()
     if request.method == "POST":
-        new_pw        = request.form["password"]
-        user.password = generate_password_hash(new_pw)
+        new_pw = request.form["password"]
+        try:
+            user.password = hasher.hash_password(new_pw)
+        except HashingBusy:
+            return refuse(
+                "reset_password.html", "We're busy right now. Please try again.", 503, 1,
+                email=email
+            )
         db.session.commit()
-        return redirect(url_for("login"))
+        account_limiter.reset(email.strip().lower())
+        user_cache.user_cache.invalidate(user.id)
+        return redirect(url_for("main.login"))
     return render_template("reset_password.html", email=email)
 
 
+def pantry_args():
+    """Pantry ingredients from ?have=flour,eggs (or repeated ?have=)."""
+    return [
+        item.strip()
+        for value in request.args.getlist("have")
+        for item in value.split(",")
+        if item.strip()
+    ]
+
+
+def pantry_matches(pantry, limit=FEED_PAGE_SIZE):
+    """[(recipe, matched, total)] for the best-covered public recipes."""
+    hits = pantry_index.query(pantry, limit)
+    by_id = {
+        r.id: r for r in
+        Recipe.query.options(joinedload(Recipe.user))
+        .filter(Recipe.id.in_([recipe_id for recipe_id, _, _ in hits]))
+    }
+    return [
+        (by_id[recipe_id], matched, total)
+        for recipe_id, matched, total in hits if recipe_id in by_id
+    ]
+
+
+@bp.route("/pantry")
+def pantry():
+    """Cook with what I have: recipes ranked by pantry coverage."""
+    have = pantry_args()
+    matches = pantry_matches(have) if have else []
+    return render_template(
+        "recipes.html",
+        recipes=[recipe for recipe, _, _ in matches],
+        query=", ".join(have)
+    )
+
+
+@bp.route("/api/pantry")
+def api_pantry():
+    matches = pantry_matches(pantry_args())
+    return jsonify({
+        "recipes": [
+            dict(recipe_summary(recipe), matched=matched, total=total,
+                 coverage=round(matched / total, 3))
+            for recipe, matched, total in matches
+        ],
+    })
+
+
+def recommended_recipes(limit=FEED_PAGE_SIZE):
+    """The current user's recommendations as Recipe rows, best first."""
+    ids = recommend.recommended_ids(current_user.id, limit)
+    by_id = {
+        r.id: r for r in
+        Recipe.query.options(joinedload(Recipe.user))
+        .filter(Recipe.id.in_(ids), Recipe.is_public.is_(True))
+    }
+    return [by_id[i] for i in ids if i in by_id]
+
+
+@bp.route("/recommended")
+@login_required
+def recommended():
+    """Recipes close to what you favorite and rate highly."""
+    return render_template(
+        "recipes.html",
+        recipes=recommended_recipes(),
+        heading="Recommended for you"
+    )
+
+
+@bp.route("/api/recommendations")
+@login_required
+def api_recommendations():
+    limit = min(max(request.args.get("limit", FEED_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    return jsonify({
+        "recipes": [recipe_summary(r) for r in recommended_recipes(limit)],
+    })
+
+
+def board_args():
+    before   = leaderboard.decode_cursor(request.args.get("before"))
+    per_page = min(max(request.args.get("limit", FEED_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    return before, per_page
+
+
+def render_board(board, heading):
+    before, _ = board_args()
+    rows, next_cursor = leaderboard.board_page(board, before, FEED_PAGE_SIZE)
+    next_url = (
+        url_for(request.endpoint, before=next_cursor) if next_cursor else None
+    )
+    return render_template(
+        "recipes.html",
+        recipes=[recipe for recipe, _ in rows],
+        next_url=next_url,
+        heading=heading
+    )
+
+
+@bp.route("/top")
+def top_rated():
+    """Public recipes by Bayesian-weighted average rating."""
+    return render_board("top", "Top rated")
+
+
+@bp.route("/trending")
+def trending():
+    """Public recipes with the most recent rating and favorite activity."""
+    return render_board("trending", "Trending")
+
+
+@bp.route("/api/top")
+def api_top_rated():
+    before, per_page = board_args()
+    rows, next_cursor = leaderboard.board_page("top", before, per_page)
+    return jsonify({
+        "recipes":     [dict(recipe_summary(r), score=round(key, 3)) for r, key in rows],
+        "next_cursor": next_cursor,
+    })
+
+
+@bp.route("/api/trending")
+def api_trending():
+    before, per_page = board_args()
+    rows, next_cursor = leaderboard.board_page("trending", before, per_page)
+    return jsonify({
+        "recipes": [
+            dict(recipe_summary(r), activity=round(leaderboard.trending_activity(key), 3))
+            for r, key in rows
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+@bp.route("/api/ingredients/suggest")
+def suggest_ingredients():
+    """
+    Autocomplete for an ingredient line: ?q=2 cups fl suggests names
+    starting with "fl", most used first, with their units. `lead` is the
+    quantity/unit part of q, to keep in front of the chosen name.
+    """
+    q     = request.args.get("q", "")
+    limit = min(max(request.args.get("limit", 10, type=int), 1), MAX_SUGGESTIONS)
+    _, _, name = split_amount(q.lstrip())
+    suggestions = suggest_index.suggest(
+        name, limit, fuzzy=request.args.get("fuzzy", "1") != "0"
+    )
+    response = jsonify({
+        "lead": q[:len(q) - len(name)],
+        "suggestions": [
+            {"name": name, "units": units, "recipes": count}
+            for name, count, units in suggestions
+        ],
+    })
+    response.cache_control.public  = True
+    response.cache_control.max_age = 300
+    return response
+
+
+@bp.cli.command("backfill-ingredients")
+@click.option("--batch-size", default=500, show_default=True,
+              help="Recipes parsed per transaction.")
+@click.option("--rebuild", is_flag=True,
+              help="Re-parse recipes that already have ingredient rows.")
+def backfill_ingredients_command(batch_size, rebuild):
+    """Parse recipe ingredient text into the recipe_ingredient table."""
+    done = backfill_ingredients(batch_size, rebuild)
+    print(f"Parsed ingredients for {done} recipes.")
+
+
+@bp.cli.command("import-urls")
+@click.argument("url_file", type=click.File())
+@click.option("--email", required=True, help="Account that will own the recipes.")
+@click.option("--workers", default=8, show_default=True,
+              help="Pages fetched concurrently.")
+@click.option("--private", is_flag=True, help="Import as private recipes.")
+def import_urls_command(url_file, email, workers, private):
+    """Import recipes from a file of URLs, one per line."""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.BadParameter(f"No account for {email}", param_hint="--email")
+    urls = [line.strip() for line in url_file if line.strip()]
+
+    imported = 0
+    for url, data in import_many(urls, max_workers=workers):
+        if not data or not data["ingredients"]:
+            print(f"skipped  {url}")
+            continue
+        recipe = Recipe(
+            title        = data["title"][:120] or url[:120],
+            ingredients  = "\n".join(data["ingredients"]),
+            instructions = "\n".join(data["instructions"]),
+            is_public    = not private,
+            user_id      = user.id,
+            image        = data["image"]
+        )
+        db.session.add(recipe)
+        db.session.flush()
+        sync_recipe_ingredients(recipe)
+        images.queue_images([recipe.image])
+        imported += 1
+        print(f"imported {url}")
+    db.session.commit()
+    print(f"Imported {imported} of {len(urls)} recipes; "
+          f"run `flask fetch-images` to download their images.")
+
+
+@bp.cli.command("export-ndjson")
+@click.argument("output", type=click.File("w"), default="-")
+@click.option("--users", is_flag=True,
+              help="Include user rows (with password hashes) for a full backup.")
+def export_ndjson_command(output, users):
+    """Write recipes, ratings and favorites to OUTPUT as NDJSON."""
+    for line in export_ndjson(include_users=users):
+        output.write(line)
+
+
+@bp.cli.command("import-ndjson")
+@click.argument("source", type=click.File())
+@click.option("--chunk-size", default=5000, show_default=True,
+              help="Rows per table inserted in one transaction.")
+def import_ndjson_command(source, chunk_size):
+    """Load an NDJSON dump; rows whose id already exists are skipped."""
+    counts = import_ndjson(source, chunk_size)
+    print(", ".join(f"{n} {kind} rows" for kind, n in counts.items()))
+
+
+@bp.cli.command("rebuild-recommendations")
+@click.option("--block-rows", default=recommend.BLOCK_ROWS, show_default=True,
+              help="Recipes scored per matrix product.")
+def rebuild_recommendations_command(block_rows):
+    """Recompute every recipe's similar-recipes list (run after bulk imports)."""
+    def progress(done, total):
+        if done == total or done % (block_rows * 40) == 0:
+            print(f"{done}/{total} recipes")
+    recommend.rebuild(block_rows, progress)
+
+
+@bp.cli.command("refresh-leaderboard")
+def refresh_leaderboard_command():
+    """Recompute the top-rated and trending boards (run periodically, e.g. hourly)."""
+    rows = refresh_leaderboard()
+    print(f"Leaderboard has {rows} recipes.")
+
+
+@bp.cli.command("init-db")
+def init_db_command():
+    """Create or upgrade the database schema and search index."""
+    upgrade_schema()
+    install_search_index()
+    install_leaderboard()
+    print("Database is up to date.")
+
+
 if __name__ == "__main__":
+    app = create_app()
     with app.app_context():
-        db.create_all()
+        upgrade_schema()
+        install_search_index()
+        install_leaderboard()
     app.run(debug=True)
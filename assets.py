@@ -0,0 +1,262 @@
+"""
+Self-hosted static assets under fingerprinted names.
+
+The sources live in static/: page stylesheets in css/, images in images/,
+and Bootstrap plus Bootstrap Icons in vendor/. The vendor files are
+fetched once from the pinned VENDOR URLs. `flask build-assets` copies
+every source to static/dist/ under a name carrying a hash of its bytes:
+
+    static/dist/css/recipes.3f2a9c1b.css
+
+On the way it rewrites relative url(...)s in stylesheets to the built
+names and drops source map comments. It writes a .gz next to every text
+file, plus a .br when the brotli module is installed. The logical →
+built names go in static/dist/manifest.json.
+
+asset_url() is url_for("static", ...) that knows those names. Built
+files are served from /assets/ with a one-year immutable Cache-Control,
+in the precompressed encoding the client accepts. Without a build
+(development) it falls back to the plain /static/ file. A vendor file
+that was never fetched falls back to its CDN URL.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+CDN = "https://cdn.jsdelivr.net/npm"
+VENDOR = {
+    "vendor/bootstrap/bootstrap.min.css":
+        f"{CDN}/bootstrap@5.3.0/dist/css/bootstrap.min.css",
+    "vendor/bootstrap/bootstrap.bundle.min.js":
+        f"{CDN}/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js",
+    "vendor/bootstrap-icons/bootstrap-icons.css":
+        f"{CDN}/bootstrap-icons@1.10.5/font/bootstrap-icons.css",
+    "vendor/bootstrap-icons/fonts/bootstrap-icons.woff2":
+        f"{CDN}/bootstrap-icons@1.10.5/font/fonts/bootstrap-icons.woff2",
+    "vendor/bootstrap-icons/fonts/bootstrap-icons.woff":
+        f"{CDN}/bootstrap-icons@1.10.5/font/fonts/bootstrap-icons.woff",
+}
+SOURCE_DIRS    = ("css", "images", "vendor")     # under static/
+DIST_DIR       = "dist"
+MANIFEST       = "manifest.json"
+HASH_LENGTH    = 8
+COMPRESSIBLE   = (".css", ".js", ".svg", ".json", ".txt")
+MIN_SAVING     = 0.9                 # keep a compressed copy only below this ratio
+ASSET_MAX_AGE  = 365 * 24 * 3600
+FETCH_TIMEOUT  = (3.05, 30)
+
+URL_RE        = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+SOURCE_MAP_RE = re.compile(rb"\n?(/\*# sourceMappingURL=[^*]*\*/|//# sourceMappingURL=\S*)\s*$")
+
+
+def fingerprint(name, data):
+    """`name` with a hash of `data` before its extension."""
+    root, ext = posixpath.splitext(name)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def rewrite_urls(css, name, manifest):
+    """Point the relative url(...)s of stylesheet `name` at their built names."""
+    base = posixpath.dirname(name)
+
+    def replace(match):
+        quote, target = match.groups()
+        if target.startswith(("data:", "http:", "https:", "/", "#")):
+            return match.group(0)
+        path, _, fragment = target.partition("#")
+        # the built name replaces any ?cache-buster
+        resolved = posixpath.normpath(posixpath.join(base, path.split("?", 1)[0]))
+        if resolved not in manifest:
+            return match.group(0)
+        built = posixpath.relpath(manifest[resolved], base)
+        if fragment:
+            built += "#" + fragment
+        return f"url({quote}{built}{quote})"
+
+    return URL_RE.sub(replace, css)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write then rename, so a reader never sees half a file
+    partial = f"{path}.{threading.get_ident()}.tmp"
+    with open(partial, "wb") as f:
+        f.write(data)
+    os.replace(partial, path)
+
+
+def _compressors():
+    yield ".gz", lambda data: gzip.compress(data, 9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return
+    yield ".br", lambda data: brotli.compress(data, quality=11)
+
+
+def source_files(static_dir):
+    """Logical names (relative to static/) of every file to build."""
+    for top in SOURCE_DIRS:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(static_dir, top)):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if not filename.startswith(".") and not filename.endswith(".tmp"):
+                    path = os.path.join(dirpath, filename)
+                    yield os.path.relpath(path, static_dir).replace(os.sep, "/")
+
+
+def build_assets(static_dir, clean=False):
+    """
+    Fingerprint and precompress every source file into static/dist/ and
+    write the manifest, which is returned. Files of earlier builds stay
+    (pages rendered before a deploy still point at them) unless `clean`.
+    """
+    dist = os.path.join(static_dir, DIST_DIR)
+    compressors = list(_compressors())
+    manifest = {}
+    # stylesheets last, so the files they reference already have built names
+    for name in sorted(source_files(static_dir), key=lambda n: n.endswith(".css")):
+        with open(os.path.join(static_dir, name), "rb") as f:
+            data = f.read()
+        if name.endswith((".css", ".js")):
+            data = SOURCE_MAP_RE.sub(b"", data)
+        if name.endswith(".css"):
+            data = rewrite_urls(data.decode(), name, manifest).encode()
+        built = manifest[name] = fingerprint(name, data)
+
+        path = os.path.join(dist, built)
+        if not os.path.exists(path):
+            _write(path, data)
+        if name.endswith(COMPRESSIBLE):
+            for suffix, compress in compressors:
+                if not os.path.exists(path + suffix):
+                    packed = compress(data)
+                    if len(packed) < len(data) * MIN_SAVING:
+                        _write(path + suffix, packed)
+
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    if clean:
+        keep = {os.path.join(dist, MANIFEST)}
+        for built in manifest.values():
+            path = os.path.join(dist, built)
+            keep.update((path, path + ".gz", path + ".br"))
+        for dirpath, _, filenames in os.walk(dist):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if path not in keep:
+                    os.remove(path)
+    return manifest
+
+
+def fetch_vendor(static_dir):
+    """
+    Download the VENDOR files that are not in static/ yet. Returns (count
+    fetched, {name: error} of those that could not be); asset_url() sends
+    the missing ones to the CDN.
+    """
+    from requests import RequestException
+    from utils import http_session
+
+    fetched, failed = 0, {}
+    for name, url in VENDOR.items():
+        path = os.path.join(static_dir, name)
+        if os.path.exists(path):
+            continue
+        try:
+            resp = http_session().get(url, timeout=FETCH_TIMEOUT)
+            resp.raise_for_status()
+        except RequestException as e:
+            failed[name] = e
+            continue
+        _write(path, resp.content)
+        fetched += 1
+    return fetched, failed
+
+
+class Assets:
+    """The manifest of the last build, loaded by init_app()."""
+
+    def __init__(self):
+        self.manifest = {}
+        self.version  = "dev"
+
+    def load(self, path):
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            self.manifest, self.version = {}, "dev"
+        else:
+            self.manifest = json.loads(raw)
+            self.version  = hashlib.sha1(raw).hexdigest()[:8]
+
+
+assets = Assets()
+
+
+def asset_url(filename):
+    """URL of static file `filename` under its built name, when there is one."""
+    built = assets.manifest.get(filename)
+    if built is not None:
+        return url_for("assets", filename=built)
+    if filename in VENDOR and not os.path.exists(os.path.join(current_app.static_folder, filename)):
+        return VENDOR[filename]
+    return url_for("static", filename=filename)
+
+
+def _precompressed(dist, filename):
+    """(encoding, file to send) for the best stored encoding the client accepts."""
+    if filename.endswith(COMPRESSIBLE):
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if request.accept_encodings[encoding]:
+                path = safe_join(dist, filename + suffix)
+                if path is not None and os.path.isfile(path):
+                    return encoding, filename + suffix
+    return None, filename
+
+
+def init_app(app):
+    """Load the manifest and attach the /assets/ route and CLI command to `app`."""
+    dist = os.path.join(app.static_folder, DIST_DIR)
+    assets.load(os.path.join(dist, MANIFEST))
+    app.extensions["assets"] = assets
+
+    @app.route("/assets/<path:filename>", endpoint="assets")
+    def assets_file(filename):
+        # built names carry a content hash: a URL's bytes never change
+        encoding, stored = _precompressed(dist, filename)
+        response = send_from_directory(
+            dist, stored, max_age=ASSET_MAX_AGE,
+            mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        )
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+        if filename.endswith(COMPRESSIBLE):
+            response.vary.add("Accept-Encoding")
+        response.cache_control.public    = True
+        response.cache_control.immutable = True
+        return response
+
+    @app.cli.command("build-assets")
+    @click.option("--clean", is_flag=True,
+                  help="Delete files of earlier builds that the new manifest does not use.")
+    def build_assets_command(clean):
+        """Fetch missing vendor files, then fingerprint and precompress static/."""
+        fetched, failed = fetch_vendor(app.static_folder)
+        for name, error in failed.items():
+            print(f"Skipped {name} (still served from the CDN): {error}")
+        manifest = build_assets(app.static_folder, clean)
+        built = os.path.join(app.static_folder, DIST_DIR)
+        assets.load(os.path.join(built, MANIFEST))
+        print(f"Fetched {fetched} vendor files, built {len(manifest)} assets into {built}.")
+
+    return assets
@@ -0,0 +1,96 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import app.py
+and to have a ready app, and which heavy modules that drags in.
+
+Each measurement is a new Python process, so nothing is warm but the OS
+file cache. --rev also measures an older commit (extracted with
+`git archive`) for a before/after comparison:
+
+    python benchmarks/import_time.py --runs 15 --rev HEAD~1
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("requests", "bs4", "recipe_scrapers", "numpy", "PIL")
+
+# `from app import app` builds the app in both old (module-level app) and
+# new (create_app on first access) trees, so it measures worker boot either way
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+from app import app
+ready = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "boot_ms":   (ready - started) * 1000,
+    "heavy":     [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(tree, runs, env):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=tree, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "boot_ms":   round(statistics.median(s["boot_ms"] for s in samples), 1),
+        "heavy":     samples[-1]["heavy"],
+    }
+
+
+def extract(rev, into):
+    archive = subprocess.run(
+        ["git", "archive", "--format=tar", rev], cwd=ROOT,
+        capture_output=True, check=True
+    ).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(into)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--rev", help="also measure this git revision")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'boot.db')}",
+            MAIL_OUTBOX_WORKERS="0",
+        )
+        trees = {"working tree": ROOT}
+        if args.rev:
+            trees[args.rev] = os.path.join(tmp, "rev")
+            extract(args.rev, trees[args.rev])
+
+        results = {}
+        for name, tree in trees.items():
+            measure(tree, 1, env)           # write the .pyc files first
+            results[name] = measure(tree, args.runs, env)
+
+    print(f"{'tree':<14} {'import':>9} {'boot':>9}  heavy modules loaded")
+    for name, r in results.items():
+        print(f"{name:<14} {r['import_ms']:>7}ms {r['boot_ms']:>7}ms  "
+              f"{', '.join(r['heavy']) or '-'}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
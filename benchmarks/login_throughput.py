@@ -0,0 +1,176 @@
+"""
+Concurrent login benchmark: password hashing inline vs in the process pool.
+
+Threads log in as different users through the Flask test client for a
+fixed time while one more thread keeps requesting a cheap page. For
+each mode it reports logins per second, login latency, how many logins
+were shed with 503 (queue full), and the latency of the cheap page,
+which shows whether a login burst stalls the rest of the worker:
+
+    python benchmarks/login_throughput.py --concurrency 16 --duration 10
+
+Throttling is switched off so every attempt is hashed. Each run builds
+its own throwaway database.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PASSWORD = "benchmark"
+PROBE_PATH = "/api/recipes?limit=1"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def summary(timings):
+    timings = sorted(timings)
+    return {
+        "p50_ms": round(percentile(timings, 0.50), 1) if timings else None,
+        "p95_ms": round(percentile(timings, 0.95), 1) if timings else None,
+    }
+
+
+def create_users(app, count, method):
+    from werkzeug.security import generate_password_hash
+    from models import db, User, upgrade_schema
+
+    with app.app_context():
+        upgrade_schema()
+        if not db.session.query(User.id).first():
+            # one hash for everyone: checking it costs the same either way
+            password = generate_password_hash(PASSWORD, method)
+            db.session.execute(db.insert(User), [
+                {"username": f"user{i}", "email": f"user{i}@example.com",
+                 "password": password, "is_verified": True}
+                for i in range(count)
+            ])
+            db.session.commit()
+        db.session.remove()
+
+
+def measure(app, concurrency, duration):
+    stop = threading.Event()
+    logins, shed, probes = [], [0], []
+    lock = threading.Lock()
+
+    def log_in(worker):
+        client = app.test_client()
+        n = 0
+        while not stop.is_set():
+            email = f"user{(worker * 1000 + n) % concurrency}@example.com"
+            n += 1
+            started = time.perf_counter()
+            response = client.post("/login", data={"email": email, "password": PASSWORD})
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if response.status_code == 302:
+                    logins.append(elapsed)
+                elif response.status_code == 503:
+                    shed[0] += 1
+                else:
+                    raise RuntimeError(f"login returned {response.status_code}")
+            client.get("/logout")
+
+    def probe():
+        client = app.test_client()
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get(PROBE_PATH)
+            probes.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=log_in, args=(i,)) for i in range(concurrency)]
+    threads.append(threading.Thread(target=probe))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "logins":         len(logins),
+        "logins_per_s":   round(len(logins) / elapsed, 1),
+        "shed":           shed[0],
+        "login":          summary(logins),
+        "other_requests": summary(probes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=16, help="threads logging in")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per mode")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="hashing processes in pool mode")
+    parser.add_argument("--queue", type=int, default=64, help="PASSWORD_HASH_QUEUE in pool mode")
+    parser.add_argument("--method", default=None, help="PASSWORD_HASH_METHOD (default: the app's)")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import passwords
+    from app import create_app
+    from models import db
+
+    method = args.method or passwords.DEFAULT_METHOD
+    modes = {"inline": 0, "pool": args.workers}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, workers in modes.items():
+            app = create_app({
+                "SQLALCHEMY_DATABASE_URI":    f"sqlite:///{os.path.join(tmp, 'login.db')}",
+                "SECRET_KEY":                 "benchmark",
+                "MAIL_OUTBOX_WORKERS":        0,
+                "IMAGE_WORKERS":              0,
+                "PASSWORD_HASH_METHOD":       method,
+                "PASSWORD_HASH_WORKERS":      workers,
+                "PASSWORD_HASH_QUEUE":        args.queue,
+                "LOGIN_FAILURES_PER_IP":      0,
+                "LOGIN_FAILURES_PER_ACCOUNT": 0,
+            })
+            app.logger.disabled = True
+            create_users(app, args.concurrency, method)
+            # start the pool (and warm every path) before timing
+            app.test_client().post("/login", data={"email": "user0@example.com", "password": PASSWORD})
+            results[mode] = measure(app, args.concurrency, args.duration)
+            passwords.hasher.shutdown()
+            with app.app_context():
+                db.engine.dispose()
+
+    report = {
+        "method":      method,
+        "concurrency": args.concurrency,
+        "workers":     args.workers,
+        "cpus":        os.cpu_count(),
+        "modes":       results,
+    }
+    print(f"{'mode':<8} {'logins/s':>9} {'login p95':>10} {'shed':>6} {'other p50':>10} {'other p95':>10}",
+          file=sys.stderr)
+    for mode, r in results.items():
+        print(f"{mode:<8} {r['logins_per_s']:>9} {r['login']['p95_ms']:>8}ms {r['shed']:>6} "
+              f"{r['other_requests']['p50_ms']:>8}ms {r['other_requests']['p95_ms']:>8}ms",
+              file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Page-weight benchmark: bytes on the wire for a cold page load, with and
+without compression, and what gzipping costs the server.
+
+For each page it fetches the HTML plus every stylesheet, script and
+image it links to, first as a client without Accept-Encoding and then
+as one that accepts gzip and br. It reports the bytes of each, the links
+that still point off-site (vendor files never fetched), and the median
+server time for the HTML in both modes:
+
+    python benchmarks/seed.py bench.db
+    flask build-assets          # without it, assets are plain /static/ files
+    python benchmarks/page_weight.py bench.db --requests 50
+
+Runs on a copy of the database.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = {
+    "home":        lambda rid: "/",
+    "view_recipe": lambda rid: f"/recipe/{rid}",
+    "top_rated":   lambda rid: "/top",
+}
+LINK_RE = re.compile(r"""(?:href|src)="([^"]+\.(?:css|js|jpg|png|svg|woff2?))\"""")
+CSS_URL_RE = re.compile(r"""url\(\s*['"]?([^'")?#]+)""")
+ENCODINGS = {"identity": "", "compressed": "gzip, br"}
+
+
+def fetch(client, path, encoding):
+    """Body of `path` as sent to a client accepting `encoding`."""
+    response = client.get(path, headers={"Accept-Encoding": encoding})
+    body = response.data
+    response.close()
+    return body
+
+
+def page_load(client, path, encoding):
+    """(html bytes, asset bytes, off-site links) of one cold load of `path`."""
+    html_bytes = len(fetch(client, path, encoding))
+    # links are read from the plain copies; the sizes are of the encoded ones
+    links = LINK_RE.findall(fetch(client, path, "").decode())
+    asset_bytes, external, seen = 0, [], set()
+    while links:
+        url = links.pop()
+        if url in seen:
+            continue
+        seen.add(url)
+        if not url.startswith("/"):
+            external.append(url)
+            continue
+        asset_bytes += len(fetch(client, url, encoding))
+        if url.endswith(".css"):
+            base = url.rsplit("/", 1)[0]
+            links.extend(
+                u if u.startswith("/") else os.path.normpath(f"{base}/{u}")
+                for u in CSS_URL_RE.findall(fetch(client, url, "").decode())
+                if not u.startswith(("data:", "http:", "https:"))
+            )
+    return html_bytes, asset_bytes, external
+
+
+def server_ms(client, path, encoding, requests):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        fetch(client, path, encoding)
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("database", help="SQLite file built by benchmarks/seed.py")
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per page and mode")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    from models import db, Recipe
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        shutil.copyfile(args.database, path)
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+            "SECRET_KEY":              "benchmark",
+            "MAIL_OUTBOX_WORKERS":     0,
+            "IMAGE_WORKERS":           0,
+        })
+        with app.app_context():
+            recipe_id = db.session.query(db.func.max(Recipe.id)).scalar() or 1
+        client = app.test_client()
+
+        pages = {}
+        for name, build in PAGES.items():
+            page = build(recipe_id)
+            result = {}
+            for mode, encoding in ENCODINGS.items():
+                html, asset_bytes, external = page_load(client, page, encoding)
+                result[mode] = {
+                    "html_bytes":   html,
+                    "asset_bytes":  asset_bytes,
+                    "total_bytes":  html + asset_bytes,
+                    "html_p50_ms":  server_ms(client, page, encoding, args.requests),
+                }
+            result["external_links"] = external
+            pages[name] = result
+        with app.app_context():
+            db.engine.dispose()
+
+    report = {"compress_level": app.config["COMPRESS_LEVEL"], "pages": pages}
+    print(f"{'page':<12} {'mode':<11} {'html':>8} {'assets':>9} {'total':>9} {'html p50':>9}",
+          file=sys.stderr)
+    for name, result in pages.items():
+        for mode in ENCODINGS:
+            r = result[mode]
+            print(f"{name:<12} {mode:<11} {r['html_bytes']:>8} {r['asset_bytes']:>9} "
+                  f"{r['total_bytes']:>9} {r['html_p50_ms']:>7}ms", file=sys.stderr)
+        if result["external_links"]:
+            print(f"{'':<12} off-site: {', '.join(result['external_links'])}", file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Request-level benchmark against a seeded database.
+
+Drives the Flask test client through the main pages and write endpoints
+and reports, per scenario, p50/p95/p99 latency and SQL statements per
+request, plus the process's peak RSS, as JSON. Runs on a copy of the
+seeded file, so the template stays pristine and runs stay comparable:
+
+    python benchmarks/seed.py bench.db
+    python benchmarks/run.py bench.db --save-baseline benchmarks/baseline.json
+    # ... change something ...
+    python benchmarks/run.py bench.db --baseline benchmarks/baseline.json
+
+With --baseline the exit status is 1 when a scenario's p95 latency grows
+by more than --tolerance (and at least --min-delta-ms, so sub-millisecond
+jitter doesn't count) or it issues more queries per request.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, method, logged in, path built from a random recipe id)
+SCENARIOS = [
+    ("home",         "GET",  False, lambda rid: "/"),
+    ("recipes",      "GET",  False, lambda rid: f"/recipes?before={rid}"),
+    ("view_recipe",  "GET",  False, lambda rid: f"/recipe/{rid}"),
+    ("top_rated",    "GET",  False, lambda rid: "/top"),
+    ("trending",     "GET",  False, lambda rid: "/trending"),
+    ("profile",      "GET",  True,  lambda rid: "/profile"),
+    ("rate_recipe",  "POST", True,  lambda rid: f"/rate/{rid}"),
+    ("favorite",     "POST", True,  lambda rid: f"/favorite/{rid}"),
+]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(app, db, requests_per_scenario, warmup, user_id, rng):
+    from sqlalchemy import event, select
+    from models import Recipe
+
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", count)
+        # public recipes someone else wrote: viewable anonymously, ratable by user_id
+        recipe_ids = db.session.execute(
+            select(Recipe.id).where(Recipe.is_public, Recipe.user_id != user_id)
+        ).scalars().all()
+        db.session.remove()
+
+    anonymous = app.test_client()
+    member = app.test_client()
+    with member.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+    results = {}
+    for name, method, logged_in, path in SCENARIOS:
+        client = member if logged_in else anonymous
+        timings, queries = [], []
+        for i in range(warmup + requests_per_scenario):
+            url = path(rng.choice(recipe_ids))
+            data = {"score": rng.randint(1, 5)} if name == "rate_recipe" else None
+            statements[0] = 0
+            started = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name}: {method} {url} returned {response.status_code}")
+            if i >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(statements[0])
+        timings.sort()
+        results[name] = {
+            "requests":         len(timings),
+            "p50_ms":           round(percentile(timings, 0.50), 2),
+            "p95_ms":           round(percentile(timings, 0.95), 2),
+            "p99_ms":           round(percentile(timings, 0.99), 2),
+            "queries_per_req":  round(sum(queries) / len(queries), 2),
+            "peak_rss_mb":      peak_rss_mb(),
+        }
+    return results
+
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    """Print a side-by-side table; return the names of regressed scenarios."""
+    regressed = []
+    print(f"{'scenario':<14} {'p95 base':>9} {'p95 now':>9} {'change':>8} "
+          f"{'q/req base':>11} {'q/req now':>10}", file=sys.stderr)
+    for name, now in report["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        change = (now["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0
+        slower = change > tolerance and now["p95_ms"] - base["p95_ms"] >= min_delta_ms
+        more_queries = now["queries_per_req"] > base["queries_per_req"]
+        if slower or more_queries:
+            regressed.append(name)
+        print(f"{name:<14} {base['p95_ms']:>9} {now['p95_ms']:>9} {change:>+8.0%} "
+              f"{base['queries_per_req']:>11} {now['queries_per_req']:>10}"
+              f"{'  REGRESSED' if slower or more_queries else ''}", file=sys.stderr)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("database", help="SQLite file built by benchmarks/seed.py")
+    parser.add_argument("--requests", type=int, default=300, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--user", type=int, default=1, help="id of the logged-in user")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--baseline", help="compare against this earlier report")
+    parser.add_argument("--save-baseline", metavar="PATH", help="store this report as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative p95 growth before a scenario counts as regressed")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="p95 growth below this many ms never counts as a regression")
+    args = parser.parse_args()
+
+    template = os.path.abspath(args.database)
+    if not os.path.exists(template):
+        parser.error(f"{template} not found; build it with benchmarks/seed.py")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = os.path.join(tmp, "bench.db")
+        shutil.copyfile(template, copy)
+        # the app reads its configuration at import time
+        os.environ["DATABASE_URL"] = f"sqlite:///{copy}"
+        os.environ.setdefault("MAIL_OUTBOX_WORKERS", "0")
+        sys.path.insert(0, ROOT)
+        from app import app
+        from models import db
+
+        app.logger.disabled = True
+        scenarios = run(app, db, args.requests, args.warmup, args.user, random.Random(args.seed))
+        with app.app_context():
+            db.engine.dispose()
+
+    report = {
+        "revision":    git_revision(),
+        "python":      platform.python_version(),
+        "database":    os.path.basename(template),
+        "config":      {
+            key: app.config.get(key)
+            for key in ("DB_PROFILE", "FRAGMENT_CACHE_SIZE", "FRAGMENT_CACHE_SHARED")
+        },
+        "requests":    args.requests,
+        "scenarios":   scenarios,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressed = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Synthetic data generator for benchmarks.
+
+Fills a fresh database with users, recipes (ingredient lines drawn from
+data/ingredients_units.csv, with their recipe_ingredient rows), ratings
+and favorites using bulk executemany inserts. Output is deterministic for
+a given --seed, so two runs of the same command build identical data
+(rating and favorite times are spread over the ACTIVITY_DAYS before the
+run, so they shift with it):
+
+    python benchmarks/seed.py bench.db --users 10000 --recipes 100000 \\
+        --ratings 1000000 --favorites 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHUNK = 20000           # rows per executemany batch
+ACTIVITY_DAYS = 60      # ratings and favorites happen over this many days
+
+ADJECTIVES = [
+    "Classic", "Spicy", "Creamy", "Crispy", "Smoky", "Rustic", "Quick",
+    "Roasted", "Lemony", "Garlicky", "Sticky", "Herby", "Golden", "Easy",
+]
+DISHES = [
+    "Soup", "Stew", "Salad", "Pie", "Curry", "Pasta", "Risotto", "Tart",
+    "Bake", "Stir-Fry", "Pancakes", "Tacos", "Noodles", "Traybake",
+]
+STEPS = [
+    "Preheat the oven to 200C.", "Chop the vegetables.", "Mix the dry ingredients.",
+    "Whisk the eggs and milk together.", "Fry the onions until soft.",
+    "Simmer for 20 minutes.", "Season to taste.", "Bake until golden.",
+    "Rest for 5 minutes before serving.", "Garnish and serve.",
+]
+# CSV unit names → how recipe text usually spells them
+UNIT_TEXT = {
+    "milliliters": "ml", "grams": "g", "kilograms": "kg", "liters": "l",
+    "tablespoons": "tbsp", "teaspoons": "tsp", "pieces": "",
+}
+BULK_UNITS = {"grams", "milliliters"}
+
+
+def skewed(rng, n, power=3):
+    """An id in 1..n where low ids are much more likely (a few popular items)."""
+    return int(n * rng.random() ** power) + 1
+
+
+def ingredient_line(rng, name, units):
+    unit = rng.choice(units)
+    if unit in BULK_UNITS:
+        quantity = rng.choice(["50", "100", "200", "250", "500"])
+    else:
+        quantity = rng.choice(["0.5", "1", "1", "2", "2", "3", "4"])
+    unit = UNIT_TEXT.get(unit, unit)
+    return f"{quantity} {unit} {name}" if unit else f"{quantity} {name}"
+
+
+def generate_recipes(rng, count, users, vocabulary):
+    names = sorted(vocabulary)
+    for recipe_id in range(1, count + 1):
+        picked = rng.sample(names, rng.randint(4, 12))
+        yield {
+            "id":           recipe_id,
+            "title":        f"{rng.choice(ADJECTIVES)} {picked[0].title()} {rng.choice(DISHES)}",
+            "ingredients":  "\n".join(
+                ingredient_line(rng, name, vocabulary[name]) for name in picked
+            ),
+            "instructions": "\n".join(rng.sample(STEPS, rng.randint(3, 7))),
+            "is_public":    rng.random() < 0.9,
+            "user_id":      skewed(rng, users, power=2),
+        }
+
+
+def generate_pairs(rng, count, users, recipes, authors):
+    """Unique (user_id, recipe_id) pairs, never a user's own recipe."""
+    seen = set()
+    attempts = 0
+    while len(seen) < count and attempts < count * 3:
+        attempts += 1
+        user_id   = rng.randint(1, users)
+        recipe_id = skewed(rng, recipes, power=2)
+        key = user_id * (recipes + 1) + recipe_id
+        if key in seen or authors[recipe_id] == user_id:
+            continue
+        seen.add(key)
+        yield user_id, recipe_id
+
+
+def insert_chunks(conn, table, rows):
+    from sqlalchemy import insert
+
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK:
+            conn.execute(insert(table), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.execute(insert(table), batch)
+        total += len(batch)
+    return total
+
+
+def seed(app, db, users, recipes, ratings, favorites_count, rng_seed=42, log=print):
+    """Bulk-load synthetic rows into the (empty) database of `app`."""
+    from sqlalchemy import text
+    from werkzeug.security import generate_password_hash
+    from ingredients import INGREDIENTS_UNITS, ingredient_rows
+    from models import User, Recipe, Rating, RecipeIngredient, favorites, upgrade_schema
+    from search import install_search_index
+    from leaderboard import install_leaderboard
+
+    rng = random.Random(rng_seed)
+    password = generate_password_hash("benchmark")
+    authors = [0] * (recipes + 1)
+    counts = {}
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def some_time_ago():
+        return now - timedelta(days=rng.random() * ACTIVITY_DAYS)
+
+    with app.app_context():
+        # tables and indexes only: triggers and the search index come after
+        # the load, and the rating aggregates are computed in one pass
+        db.create_all()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            started = time.perf_counter()
+
+            counts["users"] = insert_chunks(conn, User.__table__, (
+                {"id": i, "username": f"user{i}", "email": f"user{i}@example.com",
+                 "password": password, "is_verified": True}
+                for i in range(1, users + 1)
+            ))
+
+            def recipe_rows():
+                for row in generate_recipes(rng, recipes, users, INGREDIENTS_UNITS):
+                    authors[row["id"]] = row["user_id"]
+                    yield row
+            counts["recipes"] = insert_chunks(conn, Recipe.__table__, recipe_rows())
+
+            counts["recipe_ingredients"] = insert_chunks(conn, RecipeIngredient.__table__, (
+                row
+                for recipe_id, blob in conn.execute(text("SELECT id, ingredients FROM recipe"))
+                for row in ingredient_rows(recipe_id, blob)
+            ))
+
+            counts["ratings"] = insert_chunks(conn, Rating.__table__, (
+                {"user_id": u, "recipe_id": r, "score": rng.choices((1, 2, 3, 4, 5), (1, 1, 3, 5, 4))[0],
+                 "rated_at": some_time_ago()}
+                for u, r in generate_pairs(rng, ratings, users, recipes, authors)
+            ))
+            counts["favorites"] = insert_chunks(conn, favorites, (
+                {"user_id": u, "recipe_id": r, "created_at": some_time_ago()}
+                for u, r in generate_pairs(rng, favorites_count, users, recipes, authors)
+            ))
+
+            conn.execute(text(
+                "UPDATE recipe SET rating_count = agg.n, rating_sum = agg.total "
+                "FROM (SELECT recipe_id, COUNT(*) AS n, SUM(score) AS total"
+                "      FROM rating GROUP BY recipe_id) AS agg "
+                "WHERE agg.recipe_id = recipe.id"
+            ))
+            log(f"inserted {counts} in {time.perf_counter() - started:.1f}s")
+
+        upgrade_schema()
+        install_search_index()
+        install_leaderboard()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("database", help="path of the SQLite file to create")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--recipes", type=int, default=100000)
+    parser.add_argument("--ratings", type=int, default=1000000)
+    parser.add_argument("--favorites", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="replace an existing file")
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.database)
+    if os.path.exists(path):
+        if not args.force:
+            parser.error(f"{path} exists; pass --force to replace it")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    from models import db
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "MAIL_OUTBOX_WORKERS":     0,
+        "IMAGE_WORKERS":           0,
+    })
+    seed(app, db, args.users, args.recipes, args.ratings, args.favorites, args.seed)
+
+
+if __name__ == "__main__":
+    main()
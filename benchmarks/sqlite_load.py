@@ -0,0 +1,163 @@
+"""
+Multi-threaded read/write load test for the SQLite engine profiles.
+
+Runs the same mixed workload -- reader threads browsing the feed and
+recipe pages, writer threads rating recipes -- once per engine profile,
+each in a fresh process and a fresh database, and prints throughput and
+"database is locked" failures side by side:
+
+    python benchmarks/sqlite_load.py --seconds 10 --readers 8 --writers 4
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "default":            {"DB_PROFILE": "default"},
+    "production":         {"DB_PROFILE": "production"},
+    "production+replica": {"DB_PROFILE": "production", "DB_READ_REPLICA": "1"},
+}
+
+
+def seed(app, db, users, recipes):
+    from sqlalchemy import insert
+    from models import User, Recipe, upgrade_schema
+    from search import install_search_index
+
+    with app.app_context():
+        upgrade_schema()
+        install_search_index()
+        db.session.execute(insert(User.__table__), [
+            {"username": f"user{i}", "email": f"user{i}@example.com",
+             "password": "x", "is_verified": True}
+            for i in range(1, users + 1)
+        ])
+        db.session.execute(insert(Recipe.__table__), [
+            {"title": f"Recipe {i}", "ingredients": "2 cups flour\n2 eggs\n1 cup milk",
+             "instructions": "Mix.\nBake.", "is_public": True,
+             "user_id": 1 + i % users}
+            for i in range(recipes)
+        ])
+        db.session.commit()
+
+
+def run_child(args):
+    sys.path.insert(0, ROOT)
+    from app import app
+    from models import db
+
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+    app.logger.disabled = True
+    seed(app, db, args.writers + 1, args.recipes)
+
+    stop     = threading.Event()
+    lock     = threading.Lock()
+    counts   = {"reads": 0, "writes": 0, "errors": 0}
+    latency  = {"reads": [], "writes": []}
+
+    def record(kind, ok, elapsed):
+        with lock:
+            if ok:
+                counts[kind] += 1
+                latency[kind].append(elapsed)
+            else:
+                counts["errors"] += 1
+
+    def reader():
+        client = app.test_client()
+        while not stop.is_set():
+            if random.random() < 0.5:
+                url = f"/recipes?before={random.randint(2, args.recipes)}"
+            else:
+                url = f"/recipe/{random.randint(1, args.recipes)}"
+            started = time.perf_counter()
+            status = client.get(url).status_code
+            record("reads", status == 200, time.perf_counter() - started)
+
+    def writer(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+            session["_fresh"] = True
+        while not stop.is_set():
+            recipe_id = random.randint(1, args.recipes)
+            started = time.perf_counter()
+            status = client.post(
+                f"/rate/{recipe_id}", data={"score": random.randint(1, 5)}
+            ).status_code
+            # 403: drew one of the writer's own recipes, not a failure
+            if status != 403:
+                record("writes", status == 302, time.perf_counter() - started)
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [
+        threading.Thread(target=writer, args=(user_id,))
+        for user_id in range(1, args.writers + 1)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    def p95(values):
+        values = sorted(values)
+        return round(values[int(len(values) * 0.95)] * 1000, 1) if values else None
+
+    print(json.dumps({
+        "reads_per_s":  round(counts["reads"] / args.seconds, 1),
+        "writes_per_s": round(counts["writes"] / args.seconds, 1),
+        "errors":       counts["errors"],
+        "read_p95_ms":  p95(latency["reads"]),
+        "write_p95_ms": p95(latency["writes"]),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--recipes", type=int, default=2000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    results = {}
+    for name, env in SCENARIOS.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            child_env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'load.db')}",
+                MAIL_OUTBOX_WORKERS="0",
+                FRAGMENT_CACHE_SIZE="0",
+                **env
+            )
+            out = subprocess.run(
+                [sys.executable, __file__, "--child",
+                 "--seconds", str(args.seconds), "--readers", str(args.readers),
+                 "--writers", str(args.writers), "--recipes", str(args.recipes)],
+                env=child_env, capture_output=True, text=True, check=True
+            ).stdout
+            results[name] = json.loads(out.strip().splitlines()[-1])
+
+    print(f"{'profile':<20} {'reads/s':>9} {'writes/s':>9} {'errors':>7} "
+          f"{'read p95':>9} {'write p95':>10}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['reads_per_s']:>9} {r['writes_per_s']:>9} "
+              f"{r['errors']:>7} {r['read_p95_ms']!s:>7}ms {r['write_p95_ms']!s:>8}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Bulk export and import of recipes, ratings and favorites as NDJSON.
+
+Every line is one JSON object with a "type" key ("user", "recipe",
+"rating" or "favorite") plus the table's columns. Export streams rows
+with yield_per so memory stays flat however big the tables are; import
+buffers rows per table and inserts them with executemany, one transaction
+per chunk.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, User, Recipe, Rating, RecipeIngredient, favorites
+from ingredients import ingredient_rows, pantry_index
+from images import queue_images
+
+EXPORT_BATCH = 1000
+IMPORT_CHUNK = 5000
+
+# export order is also a valid insert order
+TABLES = {
+    "user":     User.__table__,
+    "recipe":   Recipe.__table__,
+    "rating":   Rating.__table__,
+    "favorite": favorites,
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+def _owned_by(table, user_id):
+    return table.c.user_id == user_id
+
+
+def export_ndjson(user_id=None, include_users=False, batch=EXPORT_BATCH):
+    """
+    Yield NDJSON lines. With `user_id`, only that user's recipes, the
+    ratings they gave and their favorites are exported; user rows (which
+    carry password hashes) only with `include_users`.
+    """
+    for kind, table in TABLES.items():
+        if kind == "user" and not include_users:
+            continue
+        query = select(table).order_by(*table.primary_key.columns)
+        if user_id is not None:
+            query = query.where(
+                table.c.id == user_id if kind == "user" else _owned_by(table, user_id)
+            )
+        result = db.session.execute(
+            query.execution_options(yield_per=batch)
+        ).mappings()
+        for row in result:
+            yield json.dumps(
+                {"type": kind, **row}, default=_json_default, separators=(",", ":")
+            ) + "\n"
+
+
+class NDJSONImporter:
+    """
+    Buffers parsed rows per table and flushes them with executemany.
+    Rows whose primary key already exists are skipped, so re-running an
+    import is harmless.
+    """
+
+    def __init__(self, chunk_size=IMPORT_CHUNK):
+        self.chunk_size = chunk_size
+        self.buffers    = {kind: [] for kind in TABLES}
+        self.counts     = {kind: 0 for kind in TABLES}
+        self._columns   = {
+            kind: {c.name: c for c in table.columns}
+            for kind, table in TABLES.items()
+        }
+
+    def _clean(self, kind, record):
+        columns = self._columns[kind]
+        row = {}
+        for name, value in record.items():
+            column = columns.get(name)
+            if column is None:
+                continue          # unknown or newer column: ignore
+            if value is not None and isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            row[name] = value
+        return row
+
+    def add(self, record):
+        kind = record.pop("type", None)
+        if kind not in TABLES:
+            raise ValueError(f"Unknown record type: {kind!r}")
+        self.buffers[kind].append(self._clean(kind, record))
+        if len(self.buffers[kind]) >= self.chunk_size:
+            self.flush()
+
+    def _insert_recipes(self, rows):
+        """Insert new recipes together with their parsed ingredient rows."""
+        existing = set(db.session.execute(
+            select(Recipe.id).where(Recipe.id.in_([r["id"] for r in rows]))
+        ).scalars())
+        rows = [r for r in rows if r["id"] not in existing]
+        if not rows:
+            return
+        for row in rows:
+            # the rating triggers rebuild these as the rating rows go in
+            row["rating_count"] = row["rating_sum"] = 0
+            # this host has no copy of the image yet: queue_images() fetches
+            # it, or links it if the URL is already local
+            row["image_digest"] = None
+        db.session.execute(insert(Recipe.__table__), rows)
+        queue_images(row.get("image") for row in rows)
+        parsed = [
+            line
+            for row in rows
+            for line in ingredient_rows(row["id"], row.get("ingredients") or "")
+        ]
+        if parsed:
+            db.session.execute(insert(RecipeIngredient.__table__), parsed)
+
+    def flush(self):
+        """Insert everything buffered in one transaction, parents first."""
+        for kind, table in TABLES.items():
+            rows = self.buffers[kind]
+            if not rows:
+                continue
+            if kind == "recipe":
+                self._insert_recipes(rows)
+            else:
+                db.session.execute(
+                    sqlite_insert(table).on_conflict_do_nothing(), rows
+                )
+            self.counts[kind] += len(rows)
+            self.buffers[kind] = []
+        db.session.commit()
+
+
+def import_ndjson(lines, chunk_size=IMPORT_CHUNK):
+    """Import NDJSON lines (any iterable of str). Returns rows seen per type."""
+    importer = NDJSONImporter(chunk_size)
+    for line in lines:
+        line = line.strip()
+        if line:
+            importer.add(json.loads(line))
+    importer.flush()
+    pantry_index.invalidate()
+    return importer.counts
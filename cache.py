@@ -0,0 +1,217 @@
+"""
+Rendered-fragment cache for recipe cards and recipe pages.
+
+Entries are stored under "<kind>:<recipe id>" together with the recipe's
+version; a lookup only hits when the stored version matches the one the
+caller has just read from the database. That makes a version bump (edit,
+new rating) an invalidation for every worker at once, while the explicit
+invalidate_recipe() frees the memory in this one. The stored version also
+carries build_stamp(), so markup rendered by older templates or for an
+older asset build is never served after a deploy, even from the shared
+file.
+
+A size-bounded in-process LRU sits in front of an optional shared backend
+(SQLiteBackend here; anything with get/set/delete works) so that workers
+can reuse each other's renders.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+from assets import assets
+from http_cache import TEMPLATES_VERSION
+
+
+class LRUCache:
+    """A thread-safe dict that forgets its least recently used keys."""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def build_stamp():
+    """Templates and asset build that rendered a fragment."""
+    return f"{TEMPLATES_VERSION}.{assets.version}"
+
+
+class SQLiteBackend:
+    """
+    Shared cache in a local SQLite file, visible to every worker on the
+    host. Stands in for memcached/Redis; same get/set/delete interface.
+    """
+
+    def __init__(self, path, max_entries=50000):
+        self.path        = path
+        self.max_entries = max_entries
+        self._local      = threading.local()
+        self._writes     = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fragment ("
+                " key TEXT PRIMARY KEY, version TEXT, html TEXT, stored_at REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_fragment_stored_at ON fragment (stored_at)"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT version, html FROM fragment WHERE key = ?", (key,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key, value):
+        version, html = value
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO fragment (key, version, html, stored_at) "
+            "VALUES (?, ?, ?, ?)",
+            (key, version, str(html), time.time())
+        )
+        self._writes += 1
+        if self._writes % 500 == 0:
+            # keep the file bounded: drop the oldest entries past the limit
+            conn.execute(
+                "DELETE FROM fragment WHERE key IN ("
+                " SELECT key FROM fragment ORDER BY stored_at DESC"
+                " LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM fragment WHERE key = ?", (key,))
+
+
+class FragmentCache:
+    """
+    Version-checked fragment cache with hit/miss counters.
+    Configured from the app by init_app(); disabled (always renders) until
+    then.
+    """
+    KINDS = ("card", "page")
+
+    def __init__(self):
+        self.local   = None
+        self.shared  = None
+        self._lock   = threading.Lock()
+        self.reset_stats()
+
+    def configure(self, max_entries=2048, shared=None):
+        self.local  = LRUCache(max_entries)
+        self.shared = shared
+
+    def reset_stats(self):
+        self.hits = self.shared_hits = self.misses = 0
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def fetch(self, kind, recipe_id, version, render):
+        """
+        Return the cached fragment for this recipe version, or call
+        render() and store its result.
+        """
+        if self.local is None:
+            return render()
+        key = f"{kind}:{recipe_id}"
+        version = f"{build_stamp()}:{version}"
+
+        entry = self.local.get(key)
+        if entry is not None and entry[0] == version:
+            self._count("hits")
+            return entry[1]
+
+        if self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not None and entry[0] == version:
+                html = Markup(entry[1])
+                self.local.set(key, (version, html))
+                self._count("shared_hits")
+                return html
+
+        self._count("misses")
+        html = Markup(render())
+        self.local.set(key, (version, html))
+        if self.shared is not None:
+            self.shared.set(key, (version, html))
+        return html
+
+    def invalidate_recipe(self, recipe_id):
+        """Drop every fragment of one recipe, locally and in the shared backend."""
+        if self.local is None:
+            return
+        for kind in self.KINDS:
+            key = f"{kind}:{recipe_id}"
+            self.local.delete(key)
+            if self.shared is not None:
+                self.shared.delete(key)
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "hits":        self.hits,
+            "shared_hits": self.shared_hits,
+            "misses":      self.misses,
+            "hit_ratio":   round((self.hits + self.shared_hits) / lookups, 3) if lookups else None,
+            "entries":     len(self.local) if self.local is not None else 0,
+        }
+
+
+fragment_cache = FragmentCache()
+
+
+def init_app(app):
+    """
+    Configure the cache from FRAGMENT_CACHE_SIZE (entries, 0 disables) and
+    FRAGMENT_CACHE_SHARED (path of an SQLite file shared by workers).
+    """
+    size = app.config.get("FRAGMENT_CACHE_SIZE", 2048)
+    if size:
+        shared_path = app.config.get("FRAGMENT_CACHE_SHARED")
+        fragment_cache.configure(
+            size, SQLiteBackend(shared_path) if shared_path else None
+        )
+    app.extensions["fragment_cache"] = fragment_cache
+    return fragment_cache
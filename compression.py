@@ -0,0 +1,109 @@
+"""
+gzip for dynamic responses: pages, JSON and the NDJSON export.
+
+An after_request hook compresses text responses of COMPRESS_MIN_SIZE
+bytes or more when the client accepts gzip. A streamed response has no
+size yet, so it is always compressed, chunk by chunk. The output is
+flushed every STREAM_FLUSH_BYTES or STREAM_FLUSH_SECONDS, so the client
+still gets rows while the export is being written. File responses
+(/assets/ with their precompressed copies, /media/ JPEGs) are left alone.
+
+A compressed body is a different representation from the plain one, so
+its strong ETag is weakened, as nginx does. conditional_page() compares
+ETags weakly.
+"""
+import time
+import zlib
+
+from flask import request
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/x-ndjson",
+    "application/xml", "image/svg+xml",
+)
+STREAM_FLUSH_BYTES   = 16 * 1024
+STREAM_FLUSH_SECONDS = 0.5
+
+
+def _compressor(level):
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)   # gzip framing
+
+
+def gzip_stream(source, level):
+    """gzip the iterable body `source`, flushing what is pending every so often."""
+    compressor = _compressor(level)
+    pending, flushed_at = 0, time.monotonic()
+    try:
+        for chunk in source:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk)
+            pending += len(chunk)
+            now = time.monotonic()
+            if pending >= STREAM_FLUSH_BYTES or now - flushed_at >= STREAM_FLUSH_SECONDS:
+                data += compressor.flush(zlib.Z_SYNC_FLUSH)
+                pending, flushed_at = 0, now
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        # stream_with_context pops its request context on close()
+        if hasattr(source, "close"):
+            source.close()
+
+
+def _weaken_etag(response):
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response, level, min_size):
+    """gzip `response` in place when it is worth it and the client accepts it."""
+    if response.status_code == 304:
+        # answer with the validator the compressed 200 carried
+        if request.accept_encodings["gzip"]:
+            _weaken_etag(response)
+        return response
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206)
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+        or response.cache_control.no_transform
+    ):
+        return response
+    if not response.is_streamed and len(response.get_data()) < min_size:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if not request.accept_encodings["gzip"]:
+        return response
+    if response.is_streamed:
+        response.response = gzip_stream(response.response, level)
+        response.headers.pop("Content-Length", None)
+    else:
+        compressor = _compressor(level)
+        response.set_data(compressor.compress(response.get_data()) + compressor.flush())
+    response.headers["Content-Encoding"] = "gzip"
+    _weaken_etag(response)
+    return response
+
+
+def init_app(app):
+    """
+    Compress responses from COMPRESS_LEVEL (1-9, 0 leaves it to a proxy)
+    and COMPRESS_MIN_SIZE (bytes). Call it after instrumentation.init_app
+    so Server-Timing includes the compression time.
+    """
+    level    = app.config.get("COMPRESS_LEVEL", 6)
+    min_size = app.config.get("COMPRESS_MIN_SIZE", 1024)
+    if not level:
+        return False
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, level, min_size)
+
+    return True
@@ -0,0 +1,106 @@
+"""
+SQLite engine profiles and read/write routing.
+
+The "production" profile puts the database in WAL mode with a busy
+timeout and tuned cache/mmap pragmas, so readers never block the writer
+and short write bursts queue instead of failing with "database is
+locked". Optionally, GET/HEAD requests read through a separate read-only
+engine while anything that writes still goes to the primary.
+"""
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+READ_BIND = "readonly"
+
+# name → (pragmas run on every new connection, engine options)
+PROFILES = {
+    "default": ({}, {}),
+    "production": (
+        {
+            "journal_mode": "WAL",
+            "synchronous":  "NORMAL",
+            "busy_timeout": 10000,          # ms to wait for a lock before failing
+            "cache_size":   -64000,         # KiB (negative) → 64 MB page cache
+            "mmap_size":    268435456,      # 256 MB memory-mapped reads
+            "temp_store":   "MEMORY",
+        },
+        {
+            "pool_size":     10,
+            "max_overflow":  20,
+            "pool_timeout":  30,
+            "pool_recycle":  3600,
+            "connect_args":  {"timeout": 10, "check_same_thread": False},
+        },
+    ),
+}
+
+
+def _pragma_listener(pragmas, read_only=False):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if read_only and name in ("journal_mode", "synchronous"):
+                continue            # a read-only connection can't change these
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return set_pragmas
+
+
+def read_only_uri(database_uri):
+    """sqlite:///path → a URI that opens the same file read-only."""
+    path = database_uri.split("sqlite:///", 1)[1]
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+
+def configure(app):
+    """
+    Set SQLALCHEMY_* config for the app's DB_PROFILE and DB_READ_REPLICA,
+    after every override is in and before db.init_app(app); call install()
+    afterwards to attach the pragma listeners.
+    """
+    profile = app.config.get("DB_PROFILE", "default")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE {profile!r}; choose from {sorted(PROFILES)}")
+    _, options = PROFILES[profile]
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = dict(options)
+    if app.config.get("DB_READ_REPLICA"):
+        # the replica opens whatever primary the overrides settled on
+        database_uri = app.config["SQLALCHEMY_DATABASE_URI"]
+        app.config["SQLALCHEMY_BINDS"] = {
+            READ_BIND: {"url": read_only_uri(database_uri), **options}
+        }
+
+
+def install(app, db):
+    """Attach the profile's pragmas to every engine of `db`."""
+    pragmas, _ = PROFILES[app.config.get("DB_PROFILE", "default")]
+    with app.app_context():
+        for key, engine in db.engines.items():
+            read_only = key == READ_BIND
+            if pragmas or read_only:
+                event.listen(engine, "connect", _pragma_listener(pragmas, read_only))
+
+
+class RoutingSession(Session):
+    """
+    Sends reads made while handling GET/HEAD requests to the read-only
+    engine, when one is configured. Flushes and INSERT/UPDATE/DELETE
+    statements always go to the primary, so a GET that writes (e.g.
+    confirm_email) still works.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and has_request_context()
+            and request.method in ("GET", "HEAD")
+            and not getattr(clause, "is_dml", False)
+        ):
+            reader = self._db.engines.get(READ_BIND)
+            if reader is not None:
+                return reader
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
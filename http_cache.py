@@ -0,0 +1,85 @@
+"""
+HTTP conditional requests (ETag / Last-Modified) for pages.
+
+Routes compute a validator from a cheap metadata query and hand
+conditional_page() a callback that does the real work, so a matching
+If-None-Match or If-Modified-Since is answered with 304 before any
+template is rendered or relationship loaded.
+"""
+import hashlib
+import os
+from datetime import timezone
+
+from flask import make_response, request
+from flask_login import current_user
+
+from assets import assets
+
+basedir       = os.path.abspath(os.path.dirname(__file__))
+templates_dir = os.path.join(basedir, 'templates')
+
+
+def template_fingerprint():
+    """Short hash of the template sources, so a deploy changes every ETag."""
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(templates_dir)):
+        with open(os.path.join(templates_dir, name), 'rb') as f:
+            digest.update(name.encode() + b'\0' + f.read())
+    return digest.hexdigest()[:8]
+
+
+TEMPLATES_VERSION = template_fingerprint()
+
+
+def viewer_key():
+    """Pages differ per viewer (nav, buttons), so validators do too."""
+    if current_user.is_authenticated:
+        return f"u{current_user.get_id()}"
+    return "anon"
+
+
+def make_etag(*parts):
+    """Strong ETag value for a page built from `parts` for the current viewer."""
+    # the asset build too: pages link to its fingerprinted file names
+    raw = "|".join(str(p) for p in (TEMPLATES_VERSION, assets.version, viewer_key()) + parts)
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def _not_modified_since(last_modified):
+    since = request.if_modified_since
+    if since is None or last_modified is None:
+        return False
+    # HTTP dates have whole-second precision
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def conditional_page(etag, render, last_modified=None):
+    """
+    Return a 304 if the client's validators match, else render() wrapped
+    with ETag, Last-Modified and caching headers.
+
+    Last-Modified is only used for anonymous viewers: it can't tell a
+    logged-in page from the anonymous one the browser cached earlier,
+    while the ETag (which includes the viewer) can.
+    """
+    personalized = current_user.is_authenticated
+    if personalized:
+        last_modified = None
+
+    if request.if_none_match:
+        # weak comparison: compression.py weakens the ETag of gzipped pages
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        fresh = _not_modified_since(last_modified)
+
+    response = make_response("" if fresh else render(), 304 if fresh else 200)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    response.vary.add("Cookie")
+    response.cache_control.no_cache = True
+    if personalized:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    return response
@@ -0,0 +1,209 @@
+"""
+Local copies of recipe images.
+
+Recipe.image keeps the remote URL an import found. queue_images() records
+each URL once in image_source; worker threads (or `flask fetch-images`)
+claim due rows in batches, download them, and render fixed-size JPEG
+variants named after the sha256 of the downloaded bytes:
+
+    MEDIA_DIR/ab/ab12…ef-400x200.jpg
+
+Identical bytes behind different URLs share one set of files, and a file
+name never changes meaning, so /media/ responses are cached as immutable.
+Once a row is done, every recipe using that URL gets its image_digest set
+and its version bumped, which re-renders its cached card and page. Until
+then, and for images that could not be fetched, templates show the local
+placeholder.
+"""
+import hashlib
+import io
+import os
+
+import click
+from flask import send_from_directory, url_for
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from assets import _write, asset_url
+from leased_queue import LeasedQueue, QueueWorkers
+from models import db, ImageSource, Recipe, utcnow
+
+# variant → (width, height); the size is part of the file name
+VARIANTS = {
+    "thumb": (400, 200),
+    "hero":  (1200, 300),
+}
+PLACEHOLDER    = "images/ramen.jpg"      # under static/
+JPEG_QUALITY   = 82
+MAX_BYTES      = 10 * 1024 * 1024        # larger downloads are refused
+FETCH_TIMEOUT  = (3.05, 20)              # seconds: connect, read
+MEDIA_MAX_AGE  = 365 * 24 * 3600
+
+QUEUE_CHUNK    = 500                     # URLs per statement in queue_images()
+BATCH_SIZE     = 10
+MAX_ATTEMPTS   = 4
+BACKOFF_BASE   = 60                      # seconds before the first retry, doubled after each
+POLL_INTERVAL  = 30
+
+queue = LeasedQueue(
+    ImageSource, 'fetching', (ImageSource.url,),
+    BATCH_SIZE, MAX_ATTEMPTS, BACKOFF_BASE
+)
+
+
+def variant_name(digest, variant):
+    width, height = VARIANTS[variant]
+    return f"{digest[:2]}/{digest}-{width}x{height}.jpg"
+
+
+def image_url(recipe, variant="thumb"):
+    """URL of a recipe's local image variant, or of the placeholder."""
+    if recipe.image_digest:
+        return url_for("media", filename=variant_name(recipe.image_digest, variant))
+    return asset_url(PLACEHOLDER)
+
+
+def queue_images(urls):
+    """
+    Make sure each http(s) URL in `urls` is fetched once, and point recipes
+    at images that are already local. Caller commits, then wakes the workers.
+    """
+    urls = sorted({u for u in urls if u and u.startswith(("http://", "https://"))})
+    for start in range(0, len(urls), QUEUE_CHUNK):
+        chunk = urls[start:start + QUEUE_CHUNK]
+        db.session.execute(
+            sqlite_insert(ImageSource).on_conflict_do_nothing(),
+            [{"url": url} for url in chunk]
+        )
+        db.session.execute(
+            update(Recipe)
+            .where(
+                Recipe.image == ImageSource.url,
+                Recipe.image.in_(chunk),
+                Recipe.image_digest.is_(None),
+                ImageSource.status == 'done',
+            )
+            .values(
+                image_digest=ImageSource.digest,
+                version=Recipe.version + 1,
+                updated_at=utcnow()
+            )
+        )
+
+
+def render_variants(data, digest, media_dir):
+    """Write every missing variant of the image bytes `data`."""
+    from PIL import Image, ImageOps
+
+    missing = {
+        variant: os.path.join(media_dir, variant_name(digest, variant))
+        for variant in VARIANTS
+    }
+    missing = {v: path for v, path in missing.items() if not os.path.exists(path)}
+    if not missing:
+        return
+    with Image.open(io.BytesIO(data)) as source:
+        # JPEGs can decode straight at a reduced scale, much faster
+        largest = max((VARIANTS[v] for v in missing), key=lambda size: size[0] * size[1])
+        source.draft("RGB", largest)
+        image = ImageOps.exif_transpose(source).convert("RGB")
+    for variant, path in missing.items():
+        fitted = ImageOps.fit(image, VARIANTS[variant], Image.LANCZOS)
+        out = io.BytesIO()
+        fitted.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        _write(path, out.getvalue())
+
+
+def download(url):
+    """Bytes of the image at `url`; raises ValueError or requests errors."""
+    from utils import http_session
+
+    with http_session().get(url, timeout=FETCH_TIMEOUT, stream=True) as resp:
+        resp.raise_for_status()
+        kind = resp.headers.get("Content-Type", "")
+        if not kind.startswith("image/"):
+            raise ValueError(f"not an image: {kind or 'no content type'}")
+        chunks, size = [], 0
+        for chunk in resp.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > MAX_BYTES:
+                raise ValueError(f"image larger than {MAX_BYTES} bytes")
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def fetch_image(url, media_dir):
+    """Download `url` and render its variants. Returns the sha256 digest."""
+    data = download(url)
+    digest = hashlib.sha256(data).hexdigest()
+    render_variants(data, digest, media_dir)
+    return digest
+
+
+def _mark_done(row, digest):
+    now = utcnow()
+    db.session.execute(
+        update(ImageSource)
+        .where(ImageSource.id == row.id)
+        .values(status='done', digest=digest, fetched_at=now, last_error=None)
+    )
+    db.session.execute(
+        update(Recipe)
+        .where(Recipe.image == row.url, Recipe.image_digest.is_(None))
+        .values(image_digest=digest, version=Recipe.version + 1, updated_at=now)
+    )
+
+
+def drain(media_dir, limit=None):
+    """Fetch due images until none are left (or `limit` batches). Returns count."""
+    fetched = 0
+    batches = 0
+    while limit is None or batches < limit:
+        rows = queue.claim()
+        if not rows:
+            break
+        for row in rows:
+            try:
+                digest = fetch_image(row.url, media_dir)
+            except Exception as e:
+                queue.fail(row, e)
+            else:
+                _mark_done(row, digest)
+                fetched += 1
+            db.session.commit()
+        batches += 1
+    return fetched
+
+
+def init_app(app):
+    """Attach the image workers, the /media/ route and CLI commands to `app`."""
+    workers = QueueWorkers(
+        app, "images", lambda: drain(app.config["MEDIA_DIR"]), POLL_INTERVAL,
+        app.config.get("IMAGE_WORKERS", 1)
+    )
+    app.extensions["images"] = workers
+
+    @app.route("/media/<path:filename>")
+    def media(filename):
+        response = send_from_directory(
+            app.config["MEDIA_DIR"], filename, max_age=MEDIA_MAX_AGE
+        )
+        response.cache_control.public    = True
+        response.cache_control.immutable = True
+        return response
+
+    @app.cli.command("fetch-images")
+    @click.option("--backfill", is_flag=True,
+                  help="First queue the images of recipes saved before the cache existed.")
+    def fetch_images_command(backfill):
+        """Download every due recipe image once and exit."""
+        if backfill:
+            urls = db.session.execute(
+                db.select(Recipe.image).distinct()
+                .where(Recipe.image.isnot(None), Recipe.image_digest.is_(None))
+            ).scalars().all()
+            queue_images(urls)
+            db.session.commit()
+        print(f"Fetched {drain(app.config['MEDIA_DIR'])} images.")
+
+    return workers
@@ -0,0 +1,482 @@
+"""
+Structured ingredients.
+
+Parses the free-text ingredient lines of a recipe into
+(ingredient, quantity, unit) rows, using data/ingredients_units.csv as the
+canonical ingredient vocabulary, and keeps two in-memory indexes: an
+inverted index (ingredient → recipe ids) for "cook with what I have"
+pantry queries, and a sorted prefix index for ingredient autocomplete.
+"""
+import bisect
+import csv
+import heapq
+import os
+import re
+import threading
+import time
+from collections import Counter
+from fractions import Fraction
+from functools import lru_cache
+
+from sqlalchemy import distinct, func, insert
+
+from models import db, Recipe, RecipeIngredient
+
+basedir  = os.path.abspath(os.path.dirname(__file__))
+csv_path = os.path.join(basedir, 'data', 'ingredients_units.csv')
+
+
+def load_vocabulary(path=csv_path):
+    """
+    Dict mapping ingredient names → list of allowed units. Parsed once per
+    version of the file (path and mtime); callers share the result and must
+    not modify it.
+    """
+    return _read_vocabulary(path, os.stat(path).st_mtime_ns)
+
+
+@lru_cache(maxsize=4)
+def _read_vocabulary(path, mtime_ns):
+    vocabulary = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            vocabulary[row['ingredient']] = [
+                u.strip() for u in row['units'].split(',')
+            ]
+    return vocabulary
+
+
+INGREDIENTS_UNITS = load_vocabulary()
+
+# Spellings found in recipe text → canonical unit name (the CSV's own units
+# map to themselves)
+UNIT_ALIASES = {
+    'ml': 'milliliters', 'milliliter': 'milliliters', 'millilitre': 'milliliters',
+    'millilitres': 'milliliters',
+    'l': 'liters', 'liter': 'liters', 'litre': 'liters', 'litres': 'liters',
+    'g': 'grams', 'gr': 'grams', 'gram': 'grams', 'gramme': 'grams',
+    'grammes': 'grams',
+    'kg': 'kilograms', 'kilogram': 'kilograms', 'kilo': 'kilograms',
+    'kilos': 'kilograms',
+    'cup': 'cups',
+    'tbsp': 'tablespoons', 'tbs': 'tablespoons', 'tablespoon': 'tablespoons',
+    'tsp': 'teaspoons', 'teaspoon': 'teaspoons',
+    'piece': 'pieces', 'pc': 'pieces', 'pcs': 'pieces',
+    'oz': 'ounces', 'ounce': 'ounces',
+    'lb': 'pounds', 'lbs': 'pounds', 'pound': 'pounds',
+    'clove': 'cloves', 'pinch': 'pinches', 'handful': 'handfuls',
+    'can': 'cans', 'tin': 'tins', 'bunch': 'bunches', 'slice': 'slices',
+}
+for _units in INGREDIENTS_UNITS.values():
+    for _unit in _units:
+        UNIT_ALIASES.setdefault(_unit, _unit)
+for _unit in set(UNIT_ALIASES.values()):
+    UNIT_ALIASES.setdefault(_unit, _unit)
+
+UNICODE_FRACTIONS = {
+    '½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4',
+    '⅛': '1/8', '⅜': '3/8', '⅝': '5/8', '⅞': '7/8',
+}
+
+# "1", "1.5", "1,5", "1/2", "1 1/2", optionally a range "2-3" (first value wins)
+QUANTITY_RE = re.compile(
+    r"^\s*(\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?)"
+    r"(?:\s*(?:-|–|to)\s*(?:\d+/\d+|\d+(?:[.,]\d+)?))?\s*"
+)
+PACK_RE = re.compile(r"x\s*")
+UNIT_RE = re.compile(r"([A-Za-z]+)\.?\s+(?:of\s+)?")
+WORD_RE = re.compile(r"[a-z]+")
+
+# longest ingredient name, in words, that is looked up in a line
+MAX_NAME_WORDS = 3
+
+
+def singular(word):
+    """Crude English singular, good enough to match "tomatoes" to "tomato"."""
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('oes') and len(word) > 4:
+        return word[:-2]
+    if word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def _name_key(words):
+    return tuple(singular(w) for w in words)
+
+
+# singularised word tuple → canonical vocabulary name
+CANONICAL_NAMES = {
+    _name_key(WORD_RE.findall(name.lower())): name for name in INGREDIENTS_UNITS
+}
+
+
+def _parse_quantity(text):
+    if text.isdigit():
+        return float(text)
+    text = text.replace(',', '.')
+    try:
+        if ' ' in text:
+            whole, frac = text.split()
+            return float(int(whole) + Fraction(frac))
+        return float(Fraction(text))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def canonical_ingredient(text):
+    """
+    Map free text to an ingredient name: the longest vocabulary name found
+    in it ("extra virgin olive oil" → "olive oil"), otherwise the cleaned-up
+    text itself.
+    """
+    words = WORD_RE.findall(text.lower())
+    keys  = [singular(w) for w in words]
+    for size in range(min(MAX_NAME_WORDS, len(keys)), 0, -1):
+        for start in range(len(keys) - size + 1):
+            name = CANONICAL_NAMES.get(tuple(keys[start:start + size]))
+            if name:
+                return name
+    # not in the vocabulary: drop notes after a comma or in brackets
+    cleaned = re.sub(r"\(.*?\)", "", text.lower()).split(',')[0]
+    cleaned = " ".join(WORD_RE.findall(cleaned))
+    return cleaned[:120] or None
+
+
+def split_amount(text):
+    """
+    Split the leading quantity and unit off an ingredient line:
+    "1 x 400 g chopped tomatoes" → (400.0, 'grams', 'chopped tomatoes').
+    """
+    quantity = None
+    match = QUANTITY_RE.match(text)
+    if match:
+        quantity = _parse_quantity(match.group(1))
+        text = text[match.end():]
+        # "1 x 400 g tin": the pack size is the quantity that has a unit
+        pack = PACK_RE.match(text)
+        if pack and QUANTITY_RE.match(text[pack.end():]):
+            text = text[pack.end():]
+            match = QUANTITY_RE.match(text)
+            quantity = _parse_quantity(match.group(1))
+            text = text[match.end():]
+
+    unit = None
+    first = UNIT_RE.match(text)
+    if first and first.group(1).lower() in UNIT_ALIASES:
+        unit = UNIT_ALIASES[first.group(1).lower()]
+        text = text[first.end():]
+    return quantity, unit, text
+
+
+@lru_cache(maxsize=65536)
+def parse_ingredient_line(line):
+    """
+    Split "1 1/2 cups flour, sifted" into ('flour', 1.5, 'cups').
+    Returns None for blank lines. Memoized: the same lines ("2 eggs",
+    "salt") recur across thousands of recipes.
+    """
+    text = line.strip()
+    if not text.isascii():
+        for char, replacement in UNICODE_FRACTIONS.items():
+            text = text.replace(char, ' ' + replacement)
+    if not text:
+        return None
+
+    quantity, unit, text = split_amount(text)
+    ingredient = canonical_ingredient(text)
+    if ingredient is None:
+        return None
+    return ingredient, quantity, unit
+
+
+def ingredient_rows(recipe_id, text):
+    """recipe_ingredient rows for a newline-joined ingredients blob."""
+    rows = []
+    for line in text.splitlines():
+        parsed = parse_ingredient_line(line)
+        if parsed:
+            ingredient, quantity, unit = parsed
+            rows.append({
+                'recipe_id':  recipe_id,
+                'ingredient': ingredient,
+                'quantity':   quantity,
+                'unit':       unit,
+            })
+    return rows
+
+
+def sync_recipe_ingredients(recipe):
+    """
+    Replace the structured rows of `recipe` (which must have an id) in the
+    current transaction and update the pantry index. Caller commits.
+    """
+    RecipeIngredient.query.filter_by(recipe_id=recipe.id).delete(
+        synchronize_session=False
+    )
+    rows = ingredient_rows(recipe.id, recipe.ingredients)
+    if rows:
+        db.session.execute(insert(RecipeIngredient.__table__), rows)
+    pantry_index.update_recipe(
+        recipe.id, {r['ingredient'] for r in rows}, recipe.is_public
+    )
+
+
+def backfill_ingredients(batch_size=500, rebuild=False):
+    """
+    Parse recipes into recipe_ingredient in id order, one transaction per
+    batch. Without `rebuild`, recipes that already have rows are skipped.
+    Returns the number of recipes processed.
+    """
+    done = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.session.query(Recipe.id, Recipe.ingredients)
+            .filter(Recipe.id > last_id)
+            .order_by(Recipe.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+        ids = [r.id for r in batch]
+
+        if rebuild:
+            RecipeIngredient.query.filter(
+                RecipeIngredient.recipe_id.in_(ids)
+            ).delete(synchronize_session=False)
+            todo = batch
+        else:
+            parsed = {
+                rid for (rid,) in db.session.query(RecipeIngredient.recipe_id)
+                .filter(RecipeIngredient.recipe_id.in_(ids)).distinct()
+            }
+            todo = [r for r in batch if r.id not in parsed]
+
+        rows = [row for r in todo for row in ingredient_rows(r.id, r.ingredients)]
+        if rows:
+            db.session.execute(insert(RecipeIngredient.__table__), rows)
+        db.session.commit()
+        done += len(todo)
+
+    pantry_index.invalidate()
+    suggest_index.invalidate()
+    return done
+
+
+class PantryIndex:
+    """
+    Inverted index over public recipes: ingredient → set of recipe ids,
+    plus each recipe's own ingredient set for coverage and removal.
+
+    Built from recipe_ingredient on first use and patched in place by
+    sync_recipe_ingredients(); rebuilt after `max_age` seconds so that
+    changes made by other workers show up eventually.
+    """
+
+    def __init__(self, max_age=300):
+        self.max_age   = max_age
+        self._lock     = threading.Lock()
+        self._postings = None
+        self._recipes  = None
+        self._built_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._postings = None
+
+    def _ensure_built(self):
+        if self._postings is not None and time.monotonic() - self._built_at < self.max_age:
+            return
+        postings, recipes = {}, {}
+        rows = (
+            db.session.query(RecipeIngredient.recipe_id, RecipeIngredient.ingredient)
+            .join(Recipe, Recipe.id == RecipeIngredient.recipe_id)
+            .filter(Recipe.is_public.is_(True))
+            .distinct()
+        )
+        for recipe_id, ingredient in rows:
+            postings.setdefault(ingredient, set()).add(recipe_id)
+            recipes.setdefault(recipe_id, set()).add(ingredient)
+        self._postings, self._recipes = postings, recipes
+        self._built_at = time.monotonic()
+
+    def _remove(self, recipe_id):
+        for ingredient in self._recipes.pop(recipe_id, ()):
+            ids = self._postings[ingredient]
+            ids.discard(recipe_id)
+            if not ids:
+                del self._postings[ingredient]
+
+    def update_recipe(self, recipe_id, ingredients, is_public=True):
+        with self._lock:
+            if self._postings is None:
+                return
+            self._remove(recipe_id)
+            if is_public and ingredients:
+                for ingredient in ingredients:
+                    self._postings.setdefault(ingredient, set()).add(recipe_id)
+                self._recipes[recipe_id] = set(ingredients)
+
+    def remove_recipe(self, recipe_id):
+        with self._lock:
+            if self._postings is not None:
+                self._remove(recipe_id)
+
+    def query(self, pantry, limit=24):
+        """
+        Rank public recipes by how much of their ingredient list the pantry
+        covers. Returns [(recipe_id, matched, total)], best coverage first;
+        only recipes sharing at least one ingredient with the pantry are
+        touched.
+        """
+        wanted = {canonical_ingredient(p) for p in pantry} - {None}
+        with self._lock:
+            self._ensure_built()
+            matched = Counter()
+            for ingredient in wanted:
+                matched.update(self._postings.get(ingredient, ()))
+            best = heapq.nsmallest(
+                limit,
+                matched.items(),
+                key=lambda item: (
+                    -item[1] / len(self._recipes[item[0]]), -item[1], -item[0]
+                )
+            )
+            return [
+                (recipe_id, hits, len(self._recipes[recipe_id]))
+                for recipe_id, hits in best
+            ]
+
+
+pantry_index = PantryIndex()
+
+
+def _within_distance(a, b, budget):
+    """True if the Levenshtein distance between a and b is at most `budget`."""
+    if abs(len(a) - len(b)) > budget:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)
+            ))
+        if min(current) > budget:
+            return False
+        previous = current
+    return previous[-1] <= budget
+
+
+class SuggestIndex:
+    """
+    Ingredient autocomplete: the CSV vocabulary plus every name that at
+    least `min_uses` recipes use, each with its recipe count and units.
+
+    Every word-suffix of every name ("olive oil", "oil") is a key in one
+    sorted array, so a prefix lookup is two bisects and "oil" finds "olive
+    oil". Built on first use and rebuilt after `max_age` seconds, like
+    PantryIndex.
+    """
+    MAX_UNITS = 4
+
+    def __init__(self, max_age=300, min_uses=2):
+        self.max_age   = max_age
+        self.min_uses  = min_uses
+        self._lock     = threading.Lock()
+        self._names    = None      # [(name, recipe count, units)]
+        self._keys     = []        # sorted word-suffixes of the names
+        self._targets  = []        # (index into _names, starts the name?) per key
+        self._built_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._names = None
+
+    def _ensure_built(self):
+        if self._names is not None and time.monotonic() - self._built_at < self.max_age:
+            return
+        uses = dict(
+            db.session.query(
+                RecipeIngredient.ingredient,
+                func.count(distinct(RecipeIngredient.recipe_id))
+            ).group_by(RecipeIngredient.ingredient)
+        )
+        names = sorted(
+            set(INGREDIENTS_UNITS)
+            | {name for name, count in uses.items() if count >= self.min_uses}
+        )
+        # units come from the CSV; only names outside it need the (slower,
+        # row-level) lookup of the units recipes actually use with them
+        extra = [name for name in names if name not in INGREDIENTS_UNITS]
+        observed = {}
+        if extra:
+            for ingredient, unit, count in (
+                db.session.query(
+                    RecipeIngredient.ingredient, RecipeIngredient.unit, func.count()
+                )
+                .filter(
+                    RecipeIngredient.ingredient.in_(extra),
+                    RecipeIngredient.unit.isnot(None)
+                )
+                .group_by(RecipeIngredient.ingredient, RecipeIngredient.unit)
+            ):
+                observed.setdefault(ingredient, []).append((count, unit))
+
+        entries, pairs = [], []
+        for i, name in enumerate(names):
+            units = INGREDIENTS_UNITS.get(name) or [
+                unit for _, unit in sorted(observed.get(name, ()), reverse=True)
+            ][:self.MAX_UNITS]
+            entries.append((name, uses.get(name, 0), units))
+            words = name.split()
+            for start in range(len(words)):
+                pairs.append((" ".join(words[start:]), i, start == 0))
+        pairs.sort()
+
+        self._names    = entries
+        self._keys     = [key for key, _, _ in pairs]
+        self._targets  = [(i, first) for _, i, first in pairs]
+        self._built_at = time.monotonic()
+
+    def suggest(self, q, limit=10, fuzzy=True):
+        """
+        [(name, recipe count, units)] for names starting with `q` or having
+        a word that does, most used first; names that start with it rank
+        ahead of mid-name matches. With `fuzzy`, too few matches are padded
+        with names within one or two typos of the prefix.
+        """
+        q = " ".join(WORD_RE.findall(q.lower()))
+        if not q:
+            return []
+        with self._lock:
+            self._ensure_built()
+            tiers = {}
+            lo = bisect.bisect_left(self._keys, q)
+            hi = bisect.bisect_left(self._keys, q + "\uffff")
+            for i, first in self._targets[lo:hi]:
+                tiers[i] = min(tiers.get(i, 2), 0 if first else 1)
+
+            if fuzzy and len(tiers) < limit and len(q) >= 4:
+                budget = 1 if len(q) < 6 else 2
+                n = len(q)
+                for key, (i, _) in zip(self._keys, self._targets):
+                    # the typo may have dropped or added a letter
+                    if i not in tiers and any(
+                        _within_distance(q, key[:size], budget) for size in (n, n - 1, n + 1)
+                    ):
+                        tiers[i] = 2
+
+            best = heapq.nsmallest(
+                limit, tiers.items(),
+                key=lambda item: (item[1], -self._names[item[0]][1], self._names[item[0]][0])
+            )
+            return [self._names[i] for i, _ in best]
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,230 @@
+"""
+Opt-in per-request performance instrumentation (PERF_INSTRUMENTATION=1).
+
+For every request it records wall time, the number of SQL statements and
+the time spent in them (SQLAlchemy cursor events), Jinja render time
+(Flask template signals) and outbound HTTP time (utils.page_fetched).
+The figures go out as a Server-Timing header, are aggregated into
+per-endpoint histograms served at /metrics in Prometheus text format, and
+requests slower than PERF_SLOW_REQUEST_MS are logged with their slowest
+SQL statements. Without PERF_INSTRUMENTATION there is no /metrics route;
+it answers 404.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from flask import (
+    Response, before_render_template, g, has_request_context, request,
+    template_rendered
+)
+
+from utils import page_fetched
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS   = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+MAX_STATEMENTS  = 50        # statements kept per request for the slow log
+SLOW_LOG_TOP    = 5
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label value."""
+
+    def __init__(self, name, help_text, buckets, label="endpoint"):
+        self.name      = name
+        self.help_text = help_text
+        self.buckets   = buckets
+        self.label     = label
+        self._series   = defaultdict(lambda: [[0] * len(buckets), 0, 0.0])
+        self._lock     = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            counts, _, _ = series = self._series[label_value]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, (counts, total, value_sum) in sorted(self._series.items()):
+                label = f'{self.label}="{label_value}"'
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {total}')
+                lines.append(f"{self.name}_sum{{{label}}} {value_sum}")
+                lines.append(f"{self.name}_count{{{label}}} {total}")
+        return "\n".join(lines)
+
+
+REQUEST_SECONDS = Histogram(
+    "recipe_club_request_duration_seconds", "Wall time per request.", SECONDS_BUCKETS)
+DB_SECONDS = Histogram(
+    "recipe_club_request_db_seconds", "Time spent in SQL per request.", SECONDS_BUCKETS)
+SQL_STATEMENTS = Histogram(
+    "recipe_club_request_sql_statements", "SQL statements per request.", COUNT_BUCKETS)
+RENDER_SECONDS = Histogram(
+    "recipe_club_request_render_seconds", "Jinja render time per request.", SECONDS_BUCKETS)
+HTTP_SECONDS = Histogram(
+    "recipe_club_request_http_seconds", "Outbound HTTP time per request.", SECONDS_BUCKETS)
+
+HISTOGRAMS = (REQUEST_SECONDS, DB_SECONDS, SQL_STATEMENTS, RENDER_SECONDS, HTTP_SECONDS)
+
+
+class RequestStats:
+    __slots__ = (
+        "started", "sql_count", "sql_time", "statements",
+        "render_time", "render_depth", "render_started", "http_time"
+    )
+
+    def __init__(self):
+        self.started        = time.perf_counter()
+        self.sql_count      = 0
+        self.sql_time       = 0.0
+        self.statements     = []
+        self.render_time    = 0.0
+        self.render_depth   = 0
+        self.render_started = 0.0
+        self.http_time      = 0.0
+
+
+def current_stats():
+    if has_request_context():
+        return g.get("perf")
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # on the statement's own context: a statement that raises never reaches
+    # after_cursor_execute, and its start time goes away with the context
+    context._perf_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._perf_started
+    stats = current_stats()
+    if stats is None:
+        return
+    stats.sql_count += 1
+    stats.sql_time  += elapsed
+    if len(stats.statements) < MAX_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+
+def _before_render(sender, template, context, **extra):
+    stats = current_stats()
+    if stats is None:
+        return
+    # nested renders (cached card fragments) count once, in the outer one
+    if stats.render_depth == 0:
+        stats.render_started = time.perf_counter()
+    stats.render_depth += 1
+
+
+def _after_render(sender, template, context, **extra):
+    stats = current_stats()
+    if stats is None or stats.render_depth == 0:
+        return
+    stats.render_depth -= 1
+    if stats.render_depth == 0:
+        stats.render_time += time.perf_counter() - stats.render_started
+
+
+def _page_fetched(sender, seconds, **extra):
+    stats = current_stats()
+    if stats is not None:
+        stats.http_time += seconds
+
+
+def _server_timing(stats, total):
+    return ", ".join([
+        f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries"',
+        f"render;dur={stats.render_time * 1000:.1f}",
+        f"http;dur={stats.http_time * 1000:.1f}",
+        f"total;dur={total * 1000:.1f}",
+    ])
+
+
+def _fragment_cache_lines(fragment_cache):
+    stats = fragment_cache.stats()
+    lines = [
+        "# HELP recipe_club_fragment_cache_lookups_total Fragment cache lookups by result.",
+        "# TYPE recipe_club_fragment_cache_lookups_total counter",
+    ]
+    for result in ("hits", "shared_hits", "misses"):
+        lines.append(f'recipe_club_fragment_cache_lookups_total{{result="{result}"}} {stats[result]}')
+    lines += [
+        "# HELP recipe_club_fragment_cache_entries Fragments held by this worker.",
+        "# TYPE recipe_club_fragment_cache_entries gauge",
+        f"recipe_club_fragment_cache_entries {stats['entries']}",
+    ]
+    return lines
+
+
+def metrics_text(fragment_cache=None):
+    parts = [h.render() for h in HISTOGRAMS]
+    if fragment_cache is not None:
+        parts += _fragment_cache_lines(fragment_cache)
+    return "\n".join(parts) + "\n"
+
+
+def init_app(app, db):
+    """
+    Wire instrumentation into `app` if PERF_INSTRUMENTATION is set; a no-op
+    (and no /metrics) otherwise. Metrics are per worker process.
+    """
+    if not app.config.get("PERF_INSTRUMENTATION"):
+        return False
+    slow_ms = app.config.get("PERF_SLOW_REQUEST_MS", 500)
+
+    from sqlalchemy import event
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    page_fetched.connect(_page_fetched)
+
+    @app.before_request
+    def start_timer():
+        g.perf = RequestStats()
+
+    @app.after_request
+    def record(response):
+        stats = g.pop("perf", None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.started
+        endpoint = request.endpoint or "unmatched"
+
+        REQUEST_SECONDS.observe(endpoint, total)
+        DB_SECONDS.observe(endpoint, stats.sql_time)
+        SQL_STATEMENTS.observe(endpoint, stats.sql_count)
+        RENDER_SECONDS.observe(endpoint, stats.render_time)
+        HTTP_SECONDS.observe(endpoint, stats.http_time)
+        response.headers["Server-Timing"] = _server_timing(stats, total)
+
+        if total * 1000 >= slow_ms:
+            slowest = sorted(stats.statements, reverse=True)[:SLOW_LOG_TOP]
+            app.logger.warning(
+                "Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms, "
+                "render %.0f ms, http %.0f ms\n%s",
+                request.method, request.full_path, endpoint, total * 1000,
+                stats.sql_count, stats.sql_time * 1000,
+                stats.render_time * 1000, stats.http_time * 1000,
+                "\n".join(f"  {t * 1000:7.1f} ms  {sql}" for t, sql in slowest)
+            )
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(
+            metrics_text(app.extensions.get("fragment_cache")),
+            mimetype="text/plain; version=0.0.4"
+        )
+
+    return True
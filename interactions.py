@@ -0,0 +1,134 @@
+"""
+Ratings and favorites as single-statement, index-backed writes.
+
+A rating is an INSERT ... ON CONFLICT DO UPDATE against the unique
+(user_id, recipe_id) index; triggers on the rating table keep the recipe's
+aggregates and version in step. Favorites are INSERT OR IGNORE / DELETE on
+the favorites primary key, and membership is an EXISTS probe of it.
+"""
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Recipe, Rating, favorites
+
+MIN_SCORE = 1
+MAX_SCORE = 5
+
+
+class InteractionError(ValueError):
+    """A rating or favorite request that can't be applied; str() is user-facing."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def recipe_owner(recipe_id):
+    """Author id of a recipe; InteractionError(404) if it doesn't exist."""
+    owner = db.session.execute(
+        select(Recipe.user_id).where(Recipe.id == recipe_id)
+    ).scalar()
+    if owner is None:
+        raise InteractionError("Recipe not found.", 404)
+    return owner
+
+
+def set_rating(user_id, recipe_id, score):
+    """Create or replace `user_id`'s rating of a recipe. Caller commits."""
+    # True or 4.5 must not quietly count as a whole star rating
+    if type(score) is not int:
+        raise InteractionError("Score must be a whole number.")
+    if not MIN_SCORE <= score <= MAX_SCORE:
+        raise InteractionError(f"Score must be between {MIN_SCORE} and {MAX_SCORE}.")
+    if recipe_owner(recipe_id) == user_id:
+        raise InteractionError("You can't rate your own recipe.", 403)
+
+    db.session.execute(
+        sqlite_insert(Rating)
+        .values(user_id=user_id, recipe_id=recipe_id, score=score)
+        .on_conflict_do_update(
+            index_elements=[Rating.user_id, Rating.recipe_id],
+            set_={"score": score}
+        )
+    )
+    return score
+
+
+def user_rating(user_id, recipe_id):
+    return db.session.execute(
+        select(Rating.score).where(
+            Rating.user_id == user_id, Rating.recipe_id == recipe_id
+        )
+    ).scalar()
+
+
+def is_favorite(user_id, recipe_id):
+    return db.session.execute(
+        select(exists().where(
+            favorites.c.user_id == user_id,
+            favorites.c.recipe_id == recipe_id
+        ))
+    ).scalar()
+
+
+def set_favorite(user_id, recipe_id, value=True):
+    """Add or remove a favorite; a no-op if it is already so. Caller commits."""
+    if not isinstance(value, bool):
+        raise InteractionError("Favorite must be true or false.")
+    recipe_owner(recipe_id)
+    if value:
+        db.session.execute(
+            sqlite_insert(favorites)
+            .values(user_id=user_id, recipe_id=recipe_id)
+            .on_conflict_do_nothing()
+        )
+    else:
+        db.session.execute(
+            delete(favorites).where(
+                favorites.c.user_id == user_id,
+                favorites.c.recipe_id == recipe_id
+            )
+        )
+    return value
+
+
+def apply_batch(user_id, payload):
+    """
+    Apply {"favorites": {recipe_id: bool}, "ratings": {recipe_id: score}}
+    for one user. A favorite that isn't a JSON boolean, or a rating that
+    isn't a JSON integer, rejects the whole batch; otherwise each item succeeds or fails on its own. Returns
+    (results, errors, touched recipe ids). Caller commits.
+    """
+    if not isinstance(payload, dict):
+        raise InteractionError("Expected a JSON object.")
+    marks = payload.get("favorites")
+    if isinstance(marks, dict):
+        for key, value in marks.items():
+            # "false" or 0 must not quietly count as true
+            if not isinstance(value, bool):
+                raise InteractionError(f"Favorite {key} must be true or false.")
+    scores = payload.get("ratings")
+    if isinstance(scores, dict):
+        for key, score in scores.items():
+            if type(score) is not int:
+                raise InteractionError(f"Rating {key} must be a whole number.")
+    results = {"favorites": {}, "ratings": {}}
+    errors  = {"favorites": {}, "ratings": {}}
+    touched = set()
+
+    for kind, apply in (("favorites", set_favorite), ("ratings", set_rating)):
+        items = payload.get(kind) or {}
+        if not isinstance(items, dict):
+            raise InteractionError(f"'{kind}' must map recipe ids to values.")
+        for key, value in items.items():
+            try:
+                recipe_id = int(key)
+            except (TypeError, ValueError):
+                errors[kind][key] = "Invalid recipe id."
+                continue
+            try:
+                results[kind][key] = apply(user_id, recipe_id, value)
+                touched.add(recipe_id)
+            except InteractionError as e:
+                errors[kind][key] = str(e)
+    return results, errors, touched
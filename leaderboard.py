@@ -0,0 +1,212 @@
+"""
+Top-rated and trending leaderboards from a materialized table.
+
+recipe_leaderboard holds one row per recipe that has ratings or recent
+activity:
+
+- score is a Bayesian average, (PRIOR_VOTES * PRIOR_MEAN + rating_sum) /
+  (PRIOR_VOTES + rating_count), so one 5-star vote doesn't beat fifty
+  4-star ones. The prior is fixed, not the site mean, so a score only
+  moves when the recipe's own ratings do and page cursors stay valid.
+- trending is ln(sum of weight * 2^((t - EPOCH) / HALF_LIFE)) over the
+  recipe's ratings and favorites. Every key decays at the same rate, so
+  comparing keys compares decayed activity without ever rewriting them,
+  and a new event just log-adds its term.
+
+Triggers keep both in step with the rating, favorites and recipe writes,
+the way the rating aggregates are maintained (models.RATING_TRIGGERS).
+Lowered ratings, removed ratings and unfavorites only leave the trending
+key at the next refresh_leaderboard(), which recomputes every row in one
+aggregate pass; run `flask refresh-leaderboard` periodically.
+"""
+import math
+import time
+from datetime import timedelta
+
+from sqlalchemy import text, tuple_
+from sqlalchemy.orm import joinedload
+
+from models import db, Recipe, RecipeLeaderboard, utcnow
+
+PRIOR_VOTES = 5
+PRIOR_MEAN  = 3.0
+
+HALF_LIFE_DAYS  = 3.0
+DECAY           = math.log(2) / HALF_LIFE_DAYS   # per day, in log space
+EPOCH_JULIAN    = 2460676.5                      # 2025-01-01 00:00 UTC
+# a favorite weighs this much; a rating (score - 1) / 4, so a 5-star
+# rating counts like a favorite and a 1-star one not at all
+FAVORITE_WEIGHT = 1.0
+# refresh ignores events older than this; their weight is below 1/1000
+WINDOW_DAYS     = 10 * HALF_LIFE_DAYS
+# trending lists recipes whose decayed activity is at least this
+TRENDING_FLOOR  = 0.1
+
+BOARDS = {
+    "top":      RecipeLeaderboard.score,
+    "trending": RecipeLeaderboard.trending,
+}
+
+_BAYES = (
+    f"({PRIOR_VOTES * PRIOR_MEAN} + {{0}}.rating_sum) * 1.0 "
+    f"/ ({PRIOR_VOTES} + {{0}}.rating_count)"
+)
+_AGE   = f"{DECAY!r} * (julianday(coalesce({{0}}, 'now')) - {EPOCH_JULIAN})"
+# ln(exp(a) + exp(b)) without overflow; a is NULL for a recipe's first event
+_LOG_ADD = (
+    "CASE WHEN recipe_leaderboard.trending IS NULL THEN excluded.trending "
+    "ELSE max(recipe_leaderboard.trending, excluded.trending) "
+    "+ ln(1 + exp(-abs(recipe_leaderboard.trending - excluded.trending))) END"
+)
+
+LEADERBOARD_TRIGGERS = {
+    "leaderboard_score": f"""
+    CREATE TRIGGER IF NOT EXISTS leaderboard_score
+    AFTER UPDATE OF rating_count, rating_sum ON recipe BEGIN
+        INSERT INTO recipe_leaderboard (recipe_id, is_public, score)
+        VALUES (new.id, new.is_public,
+                CASE WHEN new.rating_count > 0 THEN {_BAYES.format('new')} END)
+        ON CONFLICT (recipe_id) DO UPDATE SET score = excluded.score;
+    END
+    """,
+    "leaderboard_rating": f"""
+    CREATE TRIGGER IF NOT EXISTS leaderboard_rating
+    AFTER INSERT ON rating WHEN new.score > 1 BEGIN
+        INSERT INTO recipe_leaderboard (recipe_id, is_public, trending)
+        SELECT id, is_public, ln((new.score - 1) / 4.0) + {_AGE.format('new.rated_at')}
+        FROM recipe WHERE id = new.recipe_id
+        ON CONFLICT (recipe_id) DO UPDATE SET trending = {_LOG_ADD};
+    END
+    """,
+    "leaderboard_favorite": f"""
+    CREATE TRIGGER IF NOT EXISTS leaderboard_favorite
+    AFTER INSERT ON favorites BEGIN
+        INSERT INTO recipe_leaderboard (recipe_id, is_public, trending)
+        SELECT id, is_public, {math.log(FAVORITE_WEIGHT)!r} + {_AGE.format('new.created_at')}
+        FROM recipe WHERE id = new.recipe_id
+        ON CONFLICT (recipe_id) DO UPDATE SET trending = {_LOG_ADD};
+    END
+    """,
+    "leaderboard_visibility": """
+    CREATE TRIGGER IF NOT EXISTS leaderboard_visibility
+    AFTER UPDATE OF is_public ON recipe BEGIN
+        UPDATE recipe_leaderboard SET is_public = new.is_public
+        WHERE recipe_id = new.id;
+    END
+    """,
+    "leaderboard_delete": """
+    CREATE TRIGGER IF NOT EXISTS leaderboard_delete
+    AFTER DELETE ON recipe BEGIN
+        DELETE FROM recipe_leaderboard WHERE recipe_id = old.id;
+    END
+    """,
+}
+
+REFRESH_SQL = f"""
+WITH events (recipe_id, weight, at) AS (
+    SELECT recipe_id, (score - 1) / 4.0, julianday(rated_at)
+    FROM rating WHERE score > 1 AND rated_at >= :since
+    UNION ALL
+    SELECT recipe_id, {FAVORITE_WEIGHT!r}, julianday(created_at)
+    FROM favorites WHERE created_at >= :since
+), activity AS (
+    -- summed relative to now so exp() stays small, then shifted to the epoch
+    SELECT recipe_id,
+           ln(sum(weight * exp({DECAY!r} * (at - julianday('now')))))
+           + {_AGE.format('NULL')} AS trending
+    FROM events GROUP BY recipe_id
+)
+INSERT INTO recipe_leaderboard (recipe_id, is_public, score, trending)
+SELECT recipe.id, recipe.is_public,
+       CASE WHEN recipe.rating_count > 0 THEN {_BAYES.format('recipe')} END,
+       activity.trending
+FROM recipe LEFT JOIN activity ON activity.recipe_id = recipe.id
+WHERE recipe.rating_count > 0 OR activity.recipe_id IS NOT NULL
+"""
+
+
+def _install_triggers(conn, replace=False):
+    for name, statement in LEADERBOARD_TRIGGERS.items():
+        if replace:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        conn.execute(text(statement))
+
+
+def install_leaderboard():
+    """Create the leaderboard triggers, filling the table the first time."""
+    with db.engine.begin() as conn:
+        is_new = not conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'leaderboard_score'"
+        )).first()
+        _install_triggers(conn)
+    if is_new:
+        refresh_leaderboard()
+
+
+def refresh_leaderboard():
+    """
+    Recompute every row from the rating aggregates and the last
+    WINDOW_DAYS of ratings and favorites, in one transaction; readers
+    keep seeing the old board until it commits. Also reinstalls the
+    triggers, so changed constants take effect. Returns the row count.
+    """
+    since = (utcnow() - timedelta(days=WINDOW_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    with db.engine.begin() as conn:
+        _install_triggers(conn, replace=True)
+        conn.execute(text("DELETE FROM recipe_leaderboard"))
+        conn.execute(text(REFRESH_SQL), {"since": since})
+        return conn.execute(text("SELECT COUNT(*) FROM recipe_leaderboard")).scalar()
+
+
+def _now_offset():
+    """DECAY * days since EPOCH_JULIAN: what a weight-1 event scores right now."""
+    return DECAY * (time.time() / 86400 + 2440587.5 - EPOCH_JULIAN)
+
+
+def trending_activity(key):
+    """A trending key as today's decayed activity (1.0 = one favorite now)."""
+    return math.exp(key - _now_offset())
+
+
+def encode_cursor(key, recipe_id):
+    return f"{key!r}:{recipe_id}"
+
+
+def decode_cursor(cursor):
+    """(key, recipe_id) from encode_cursor(), or None if malformed."""
+    key, _, recipe_id = (cursor or "").rpartition(":")
+    try:
+        key = float(key)
+        if not math.isfinite(key):
+            return None
+        return key, int(recipe_id)
+    except ValueError:
+        return None
+
+
+def board_page(board, before=None, per_page=24):
+    """
+    One page of a board, best first, as ([(recipe, key)], next_cursor),
+    authors eager-loaded. `before` is a decoded cursor from the previous
+    page; next_cursor is None on the last page.
+    """
+    column = BOARDS[board]
+    query = (
+        db.session.query(Recipe, column)
+        .join(RecipeLeaderboard, RecipeLeaderboard.recipe_id == Recipe.id)
+        .options(joinedload(Recipe.user))
+        .filter(RecipeLeaderboard.is_public.is_(True), column.isnot(None))
+    )
+    if board == "trending":
+        query = query.filter(column >= math.log(TRENDING_FLOOR) + _now_offset())
+    if before is not None:
+        query = query.filter(tuple_(column, RecipeLeaderboard.recipe_id) < tuple_(*before))
+    rows = (
+        query.order_by(column.desc(), RecipeLeaderboard.recipe_id.desc())
+        .limit(per_page + 1)
+        .all()
+    )
+    if len(rows) > per_page:
+        recipe, key = rows[per_page - 1]
+        return rows[:per_page], encode_cursor(key, recipe.id)
+    return rows, None
@@ -0,0 +1,117 @@
+"""
+Database tables worked through as job queues, and the threads doing it.
+
+A queue table has status, attempts, next_attempt_at, claimed_at and
+last_error columns (see OutboxMessage and ImageSource). LeasedQueue.claim()
+moves due 'pending' rows to a working status in one UPDATE … RETURNING,
+so concurrent workers never get the same row; a claim older than the
+lease belongs to a worker that died, and is handed out again. fail()
+puts a row back with exponential backoff, or gives up on it after
+max_attempts. QueueWorkers runs a module's drain() on background threads.
+"""
+import threading
+from datetime import timedelta
+
+from sqlalchemy import or_, update
+
+from models import db, utcnow
+
+CLAIM_LEASE = timedelta(minutes=5)   # a claim older than this is handed out again
+
+
+class LeasedQueue:
+    """The claim/retry side of one queue table."""
+
+    def __init__(self, model, working, columns, batch_size, max_attempts,
+                 backoff_base, lease=CLAIM_LEASE):
+        self.model        = model
+        self.working      = working       # status of a claimed row
+        self.columns      = columns       # returned by claim(), besides id and attempts
+        self.batch_size   = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base  # seconds before the first retry, doubled after each
+        self.lease        = lease
+
+    def claim(self, limit=None):
+        """Atomically mark up to `limit` due rows as claimed and return them."""
+        model = self.model
+        now = utcnow()
+        due = (
+            db.select(model.id)
+            .where(
+                model.next_attempt_at <= now,
+                or_(
+                    model.status == 'pending',
+                    (model.status == self.working) & (model.claimed_at < now - self.lease),
+                )
+            )
+            .order_by(model.id)
+            .limit(limit or self.batch_size)
+        )
+        rows = db.session.execute(
+            update(model)
+            .where(model.id.in_(due.scalar_subquery()))
+            .values(status=self.working, claimed_at=now)
+            .returning(model.id, *self.columns, model.attempts)
+        ).all()
+        db.session.commit()
+        return rows
+
+    def fail(self, row, error):
+        """Schedule a retry of claimed `row`, or mark it failed. Caller commits."""
+        attempts = row.attempts + 1
+        values = {'attempts': attempts, 'last_error': str(error)[:1000]}
+        if attempts >= self.max_attempts:
+            values['status'] = 'failed'
+        else:
+            values['status'] = 'pending'
+            values['next_attempt_at'] = utcnow() + timedelta(
+                seconds=self.backoff_base * 2 ** (attempts - 1)
+            )
+        db.session.execute(
+            update(self.model).where(self.model.id == row.id).values(**values)
+        )
+
+
+class QueueWorkers:
+    """
+    Background threads calling drain() whenever woken, and every
+    `poll_interval` seconds for due retries. Started lazily by the first
+    wake() so CLI commands and imports don't spawn threads.
+    """
+
+    def __init__(self, app, name, drain, poll_interval, workers=1):
+        self.app           = app
+        self.name          = name
+        self.drain         = drain
+        self.poll_interval = poll_interval
+        self.workers       = workers
+        self._event        = threading.Event()
+        self._lock         = threading.Lock()
+        self._threads      = []
+
+    def wake(self):
+        if self.workers < 1:
+            return
+        with self._lock:
+            if not self._threads:
+                for i in range(self.workers):
+                    thread = threading.Thread(
+                        target=self._run, name=f"{self.name}-{i}", daemon=True
+                    )
+                    thread.start()
+                    self._threads.append(thread)
+        self._event.set()
+
+    def _run(self):
+        while True:
+            self._event.wait(self.poll_interval)
+            self._event.clear()
+            with self.app.app_context():
+                try:
+                    self.drain()
+                except Exception:
+                    self.app.logger.exception("%s worker failed", self.name)
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
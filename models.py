@@ -1,13 +1,24 @@
+from datetime import datetime, timezone
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import inspect, text
+
+from db_profile import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
-db = SQLAlchemy()
+
+def utcnow():
+    """Naive UTC timestamp, the way SQLite DateTime columns store them."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 # Association table for favorites (if you still need it)
 favorites = db.Table(
     'favorites',
     db.Column('user_id',   db.Integer, db.ForeignKey('user.id'),   primary_key=True),
-    db.Column('recipe_id', db.Integer, db.ForeignKey('recipe.id'), primary_key=True)
+    db.Column('recipe_id', db.Integer, db.ForeignKey('recipe.id'), primary_key=True),
+    db.Column('created_at', db.DateTime, nullable=True, default=utcnow)
 )
 
 class User(UserMixin, db.Model):
@@ -36,6 +47,14 @@ class User(UserMixin, db.Model):
 
 class Recipe(db.Model):
     __tablename__ = 'recipe'
+    __table_args__ = (
+        # keyset pagination: public feed and per-author listings
+        db.Index('ix_recipe_public_id', 'is_public', 'id'),
+        db.Index('ix_recipe_user_id', 'user_id'),
+        # recipes still waiting for their image to be fetched (images.py)
+        db.Index('ix_recipe_image_pending', 'image',
+                 sqlite_where=db.text('image_digest IS NULL')),
+    )
 
     id           = db.Column(db.Integer,   primary_key=True)
     title        = db.Column(db.String(120), nullable=False)
@@ -44,6 +63,16 @@ class Recipe(db.Model):
     is_public    = db.Column(db.Boolean,   default=True)
     user_id      = db.Column(db.Integer,   db.ForeignKey("user.id"), nullable=False)
     image        = db.Column(db.String(512), nullable=True)
+    # sha256 of the downloaded image; names its local variants (images.py)
+    image_digest = db.Column(db.String(64), nullable=True)
+
+    # stored rating aggregates, maintained by triggers on rating
+    rating_count = db.Column(db.Integer,   nullable=False, default=0, server_default='0')
+    rating_sum   = db.Column(db.Integer,   nullable=False, default=0, server_default='0')
+
+    # bumped whenever what a recipe renders as changes; keys cached fragments
+    version      = db.Column(db.Integer,   nullable=False, default=1, server_default='1')
+    updated_at   = db.Column(db.DateTime,  nullable=True,  default=utcnow)
 
     # back to its author
     user         = db.relationship(lambda: User, back_populates="recipes")
@@ -59,20 +88,213 @@ class Recipe(db.Model):
     # ratings coming in
     ratings      = db.relationship(lambda: Rating, back_populates="recipe", lazy=True)
 
+    # parsed ingredient lines, see ingredients.py
+    ingredient_rows = db.relationship(
+        lambda: RecipeIngredient,
+        back_populates="recipe",
+        cascade="all, delete-orphan",
+        lazy=True
+    )
+
     @property
     def average_rating(self):
-        if not self.ratings:
+        if not self.rating_count:
             return None
-        return round(sum(r.score for r in self.ratings) / len(self.ratings), 1)
+        return round(self.rating_sum / self.rating_count, 1)
 
 
 class Rating(db.Model):
     __tablename__ = 'rating'
+    __table_args__ = (
+        # one rating per user per recipe; target of the upsert in interactions.py
+        db.Index('ux_rating_user_recipe', 'user_id', 'recipe_id', unique=True),
+    )
 
     id        = db.Column(db.Integer, primary_key=True)
     score     = db.Column(db.Integer, nullable=False)
     user_id   = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), nullable=False)
+    rated_at  = db.Column(db.DateTime, nullable=True, default=utcnow)   # first rated; NULL before tracking
 
     user      = db.relationship(lambda: User,   back_populates="ratings")
-    recipe    = db.relationship(lambda: Recipe, back_populates="ratings")
\ No newline at end of file
+    recipe    = db.relationship(lambda: Recipe, back_populates="ratings")
+
+
+class RecipeIngredient(db.Model):
+    __tablename__ = 'recipe_ingredient'
+    __table_args__ = (
+        # pantry lookups go ingredient → recipes
+        db.Index('ix_recipe_ingredient_ingredient', 'ingredient', 'recipe_id'),
+    )
+
+    id         = db.Column(db.Integer, primary_key=True)
+    recipe_id  = db.Column(db.Integer, db.ForeignKey('recipe.id'), nullable=False, index=True)
+    ingredient = db.Column(db.String(120), nullable=False)
+    quantity   = db.Column(db.Float,   nullable=True)
+    unit       = db.Column(db.String(40), nullable=True)
+
+    recipe     = db.relationship(lambda: Recipe, back_populates="ingredient_rows")
+
+
+class RecipeNeighbor(db.Model):
+    """One entry of a recipe's precomputed "similar recipes" list (recommend.py)."""
+    __tablename__ = 'recipe_neighbor'
+    __table_args__ = (
+        # lists that mention a recipe, to patch them when it changes
+        db.Index('ix_recipe_neighbor_neighbor_id', 'neighbor_id'),
+    )
+
+    recipe_id   = db.Column(db.Integer, db.ForeignKey('recipe.id'), primary_key=True)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), primary_key=True)
+    score       = db.Column(db.Float,   nullable=False)   # cosine similarity
+
+
+class RecipeLeaderboard(db.Model):
+    """Materialized top-rated and trending keys of a recipe (leaderboard.py)."""
+    __tablename__ = 'recipe_leaderboard'
+    __table_args__ = (
+        # each board is one range read, best first
+        db.Index('ix_recipe_leaderboard_score', 'is_public', 'score', 'recipe_id'),
+        db.Index('ix_recipe_leaderboard_trending', 'is_public', 'trending', 'recipe_id'),
+    )
+
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), primary_key=True)
+    is_public = db.Column(db.Boolean, nullable=False)
+    score     = db.Column(db.Float,   nullable=True)   # Bayesian average; NULL when unrated
+    trending  = db.Column(db.Float,   nullable=True)   # log of decayed activity; NULL when none
+
+
+class ImageSource(db.Model):
+    """A remote recipe image, downloaded once by the image workers (images.py)."""
+    __tablename__ = 'image_source'
+    __table_args__ = (
+        db.Index('ix_image_source_due', 'status', 'next_attempt_at'),
+    )
+
+    id              = db.Column(db.Integer, primary_key=True)
+    url             = db.Column(db.String(512), unique=True, nullable=False)
+    digest          = db.Column(db.String(64), nullable=True)    # sha256 of the bytes
+    status          = db.Column(db.String(16), nullable=False, default='pending')
+    attempts        = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    claimed_at      = db.Column(db.DateTime, nullable=True)
+    last_error      = db.Column(db.Text,    nullable=True)
+    fetched_at      = db.Column(db.DateTime, nullable=True)
+
+
+class OutboxMessage(db.Model):
+    """An email waiting to be sent by the outbox workers (outbox.py)."""
+    __tablename__ = 'outbox_message'
+    __table_args__ = (
+        db.Index('ix_outbox_message_due', 'status', 'next_attempt_at'),
+    )
+
+    id              = db.Column(db.Integer, primary_key=True)
+    subject         = db.Column(db.String(255), nullable=False)
+    recipients      = db.Column(db.Text,    nullable=False)   # comma-separated
+    body            = db.Column(db.Text,    nullable=False)
+    status          = db.Column(db.String(16), nullable=False, default='pending')
+    attempts        = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    claimed_at      = db.Column(db.DateTime, nullable=True)
+    last_error      = db.Column(db.Text,    nullable=True)
+    created_at      = db.Column(db.DateTime, nullable=False, default=utcnow)
+    sent_at         = db.Column(db.DateTime, nullable=True)
+
+
+# Recipe rating aggregates, version and updated_at follow the rating rows
+# inside the writing statement itself, so an upsert is a single statement
+RATING_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS rating_ai AFTER INSERT ON rating BEGIN
+        UPDATE recipe SET
+            rating_count = rating_count + 1,
+            rating_sum   = rating_sum + new.score,
+            version      = version + 1,
+            updated_at   = strftime('%Y-%m-%d %H:%M:%f', 'now')
+        WHERE id = new.recipe_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rating_au AFTER UPDATE OF score ON rating BEGIN
+        UPDATE recipe SET
+            rating_sum   = rating_sum + new.score - old.score,
+            version      = version + 1,
+            updated_at   = strftime('%Y-%m-%d %H:%M:%f', 'now')
+        WHERE id = new.recipe_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rating_ad AFTER DELETE ON rating BEGIN
+        UPDATE recipe SET
+            rating_count = rating_count - 1,
+            rating_sum   = rating_sum - old.score,
+            version      = version + 1,
+            updated_at   = strftime('%Y-%m-%d %H:%M:%f', 'now')
+        WHERE id = old.recipe_id;
+    END
+    """,
+]
+
+
+def _add_column_sql(table, column):
+    ddl = (
+        f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+        f"{column.type.compile(db.engine.dialect)}"
+    )
+    if column.server_default is not None:
+        # SQLite only accepts NOT NULL on an added column with a default
+        ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+
+def upgrade_schema():
+    """
+    Bring an existing database up to date with the models.
+    create_all() only creates missing tables, so columns added to existing
+    tables are applied here with ALTER TABLE and backfilled once.
+    """
+    db.create_all(bind_key=None)        # never DDL through the read-only engine
+    inspector = inspect(db.engine)
+    added = set()
+
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    conn.execute(text(_add_column_sql(table, column)))
+                    added.add(f"{table.name}.{column.name}")
+
+        if 'recipe.rating_count' in added:
+            conn.execute(text(
+                "UPDATE recipe SET "
+                "rating_count = (SELECT COUNT(*) FROM rating WHERE rating.recipe_id = recipe.id), "
+                "rating_sum = (SELECT COALESCE(SUM(score), 0) FROM rating WHERE rating.recipe_id = recipe.id)"
+            ))
+        if 'recipe.updated_at' in added:
+            conn.execute(text("UPDATE recipe SET updated_at = CURRENT_TIMESTAMP"))
+
+        rating_indexes = {i['name'] for i in inspector.get_indexes('rating')}
+        if 'ux_rating_user_recipe' not in rating_indexes:
+            # double-click duplicates from before the unique index: keep the
+            # latest rating per user and recipe, then recount
+            conn.execute(text(
+                "DELETE FROM rating WHERE id NOT IN "
+                "(SELECT MAX(id) FROM rating GROUP BY user_id, recipe_id)"
+            ))
+            conn.execute(text(
+                "UPDATE recipe SET "
+                "rating_count = (SELECT COUNT(*) FROM rating WHERE rating.recipe_id = recipe.id), "
+                "rating_sum = (SELECT COALESCE(SUM(score), 0) FROM rating WHERE rating.recipe_id = recipe.id)"
+            ))
+
+        for statement in RATING_TRIGGERS:
+            conn.execute(text(statement))
+
+    # create_all() skips the indexes of tables that already exist
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
@@ -0,0 +1,194 @@
+"""
+Outbound email via a persistent outbox.
+
+Routes call queue_mail() inside their own transaction and return as soon
+as it commits. A small pool of worker threads claims due messages in
+batches, sends each batch over one SMTP connection and retries failures
+with exponential backoff. `flask drain-outbox` does one pass from the
+command line, and `flask mail-sink` runs a local SMTP server that accepts
+everything, for development and tests. It speaks plain SMTP only, so
+senders pointed at it need MAIL_USE_TLS=0.
+"""
+import base64
+import os
+import socketserver
+import threading
+import time
+
+import click
+from flask_mail import Message
+from sqlalchemy import update
+
+from leased_queue import LeasedQueue, QueueWorkers
+from models import db, OutboxMessage, utcnow
+
+BATCH_SIZE    = 50
+MAX_ATTEMPTS  = 6
+BACKOFF_BASE  = 30            # seconds before the first retry, doubled after each
+POLL_INTERVAL = 5             # seconds between checks for due retries
+
+queue = LeasedQueue(
+    OutboxMessage, 'sending',
+    (OutboxMessage.subject, OutboxMessage.recipients, OutboxMessage.body),
+    BATCH_SIZE, MAX_ATTEMPTS, BACKOFF_BASE
+)
+
+
+def queue_mail(subject, recipients, body):
+    """Add a message to the outbox in the current transaction. Caller commits."""
+    message = OutboxMessage(
+        subject=subject,
+        recipients=",".join(recipients),
+        body=body
+    )
+    db.session.add(message)
+    return message
+
+
+def _mark_sent(message_id):
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id == message_id)
+        .values(status='sent', sent_at=utcnow(), last_error=None)
+    )
+
+
+def send_batch(mail, rows):
+    """Send claimed rows over a single SMTP connection, recording each outcome."""
+    sent = 0
+    handled = set()
+    try:
+        with mail.connect() as conn:
+            for row in rows:
+                msg = Message(row.subject, recipients=row.recipients.split(","))
+                msg.body = row.body
+                try:
+                    conn.send(msg)
+                except Exception as e:
+                    queue.fail(row, e)
+                else:
+                    _mark_sent(row.id)
+                    sent += 1
+                handled.add(row.id)
+    except Exception as e:
+        # could not connect or log in: retry everything not yet handled
+        for row in rows:
+            if row.id not in handled:
+                queue.fail(row, e)
+    db.session.commit()
+    return sent
+
+
+def drain(mail, limit=None):
+    """Send due messages until none are left (or `limit` batches). Returns count."""
+    sent = 0
+    batches = 0
+    while limit is None or batches < limit:
+        rows = queue.claim()
+        if not rows:
+            break
+        sent += send_batch(mail, rows)
+        batches += 1
+    return sent
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept mail from smtplib and keep it."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 localhost recipe-club mail sink")
+        envelope = {}
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                if command.upper().startswith("AUTH LOGIN"):
+                    if len(command.split()) < 3:
+                        self.reply("334 " + base64.b64encode(b"Username:").decode())
+                        self.rfile.readline()
+                    self.reply("334 " + base64.b64encode(b"Password:").decode())
+                    self.rfile.readline()
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL":
+                envelope = {"from": command[10:].strip(), "to": []}
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                envelope.setdefault("to", []).append(command[8:].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b".\r\n", b".\n"):
+                        break
+                    data.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                envelope["data"] = b"".join(data)
+                self.server.deliver(envelope)
+                envelope = {}
+                self.reply("250 OK: queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                # HELO, RSET, NOOP and anything else
+                self.reply("250 OK")
+
+
+class MailSink(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for the SMTP server. Received messages are kept in
+    `messages` and, if `maildir` is given, written there as .eml files.
+    """
+    daemon_threads      = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=1025, maildir=None):
+        super().__init__((host, port), SinkHandler)
+        self.maildir  = maildir
+        self.messages = []
+        self._lock    = threading.Lock()
+
+    def deliver(self, envelope):
+        with self._lock:
+            self.messages.append(envelope)
+            if self.maildir:
+                os.makedirs(self.maildir, exist_ok=True)
+                name = f"{time.time_ns()}-{len(self.messages)}.eml"
+                with open(os.path.join(self.maildir, name), "wb") as f:
+                    f.write(envelope["data"])
+
+
+def init_app(app, mail):
+    """Attach the outbox workers and CLI commands to `app`."""
+    workers = QueueWorkers(
+        app, "outbox", lambda: drain(mail), POLL_INTERVAL,
+        app.config.get("MAIL_OUTBOX_WORKERS", 1)
+    )
+    app.extensions["outbox"] = workers
+
+    @app.cli.command("drain-outbox")
+    def drain_outbox_command():
+        """Send every due outbox message once and exit."""
+        print(f"Sent {drain(mail)} messages.")
+
+    @app.cli.command("mail-sink")
+    @click.option("--port", default=1025, show_default=True)
+    @click.option("--maildir", default=None, help="Save messages as .eml here.")
+    def mail_sink_command(port, maildir):
+        """Run a local SMTP server that accepts and keeps all mail."""
+        sink = MailSink(port=port, maildir=maildir)
+        print(f"Mail sink listening on 127.0.0.1:{port} "
+              f"(MAIL_SERVER=127.0.0.1 MAIL_PORT={port} MAIL_USE_TLS=0)")
+        sink.serve_forever()
+
+    return workers
@@ -0,0 +1,199 @@
+"""
+Password hashing off the request thread, and login throttling.
+
+Werkzeug's scrypt hashes take tens of milliseconds of CPU and ~32 MB of
+memory each. hasher runs them in a small process pool instead, so a burst
+of logins queues there rather than stalling every other route of the
+worker. The queue is bounded: when PASSWORD_HASH_QUEUE jobs are already
+waiting, hash_password()/verify_password() raise HashingBusy at once and
+the route answers 503 instead of piling up requests.
+
+PASSWORD_HASH_METHOD sets the cost (any Werkzeug method string, e.g.
+"scrypt:32768:8:1" or "pbkdf2:sha256:1000000"). A login whose stored hash
+used other parameters is transparently re-hashed with the current ones.
+
+ip_limiter caps failed logins and registrations per client address, and
+account_limiter failed logins per account, in a sliding window checked
+before any hashing is done. Limits are per worker process; behind a
+reverse proxy, TRUSTED_PROXIES makes the address the client's.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import BrokenExecutor
+
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+)
+
+DEFAULT_METHOD = "scrypt:32768:8:1"
+HASH_TIMEOUT   = 10          # seconds a request waits for its hash
+
+
+class HashingBusy(RuntimeError):
+    """Too many hashes queued (or one took too long); retry later."""
+
+
+def canonical_method(method):
+    """A Werkzeug method string with its defaults spelled out, as hashes record it."""
+    name, *args = method.split(":")
+    if name == "scrypt":
+        n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    if name == "pbkdf2":
+        hash_name  = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Unsupported password hash method {method!r}")
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords in a process pool of `workers` processes
+    (0 runs them inline), refusing work beyond `queue_depth` pending jobs.
+    The pool starts on first use, so the CLI and imports never spawn it.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=2, queue_depth=16, timeout=HASH_TIMEOUT):
+        self.configure(method, workers, queue_depth, timeout)
+
+    def configure(self, method=DEFAULT_METHOD, workers=2, queue_depth=16, timeout=HASH_TIMEOUT):
+        if getattr(self, "_pool", None) is not None:
+            self.shutdown()
+        self.method      = canonical_method(method)
+        self.workers     = workers
+        self.queue_depth = queue_depth
+        self.timeout     = timeout
+        self._slots      = threading.BoundedSemaphore(max(queue_depth, 1))
+        self._pool       = None
+        self._lock       = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+
+                    # spawn: fresh children that don't inherit the request
+                    # threads' locks. Each re-imports the parent's __main__
+                    # (as __mp_main__), so whatever starts the app must do
+                    # it under `if __name__ == "__main__":`, as app.py does
+                    self._pool = ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy("Too many password checks in progress.")
+        try:
+            future = self._executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HashingBusy("Password check timed out.")
+        except BrokenExecutor:
+            # a hashing process died (OOM killer, ...): start afresh next time
+            self.shutdown()
+            raise HashingBusy("Password hashing restarted.")
+
+    def hash_password(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split("$", 1)[0] != self.method
+
+    def verify_password(self, pwhash, password):
+        """
+        Return (ok, new_hash): new_hash is set when the password is right
+        but `pwhash` used other cost parameters; the caller stores it.
+        """
+        ok = self._run(check_password_hash, pwhash, password)
+        if ok and self.needs_rehash(pwhash):
+            return True, self.hash_password(password)
+        return ok, None
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+class RateLimiter:
+    """
+    At most `limit` hits per key in any `window` seconds (0 disables).
+    Keeps up to `max_keys` keys, forgetting the least recently hit.
+    """
+
+    def __init__(self, limit=0, window=300, max_keys=100000):
+        self.limit    = limit
+        self.window   = window
+        self.max_keys = max_keys
+        self._hits    = OrderedDict()    # key → deque of hit times
+        self._lock    = threading.Lock()
+
+    def retry_after(self, key):
+        """Seconds until `key` may try again; 0 if it may now."""
+        if not self.limit:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                return 0
+            while hits and hits[0] <= now - self.window:
+                hits.popleft()
+            if len(hits) < self.limit:
+                return 0
+            return int(hits[0] + self.window - now) + 1
+
+    def hit(self, key):
+        if not self.limit:
+            return
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque(maxlen=self.limit)
+            hits.append(time.monotonic())
+            self._hits.move_to_end(key)
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+hasher          = PasswordHasher()
+ip_limiter      = RateLimiter()     # failed logins and registrations, per client address
+account_limiter = RateLimiter()     # failed logins, per account email
+
+
+def init_app(app):
+    """
+    Configure from PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS (0 hashes
+    inline), PASSWORD_HASH_QUEUE, PASSWORD_HASH_TIMEOUT (seconds),
+    LOGIN_FAILURES_PER_IP, LOGIN_FAILURES_PER_ACCOUNT and
+    LOGIN_THROTTLE_WINDOW (seconds).
+    """
+    hasher.configure(
+        app.config.get("PASSWORD_HASH_METHOD", DEFAULT_METHOD),
+        app.config.get("PASSWORD_HASH_WORKERS", 2),
+        app.config.get("PASSWORD_HASH_QUEUE", 16),
+        app.config.get("PASSWORD_HASH_TIMEOUT", HASH_TIMEOUT)
+    )
+    window = app.config.get("LOGIN_THROTTLE_WINDOW", 300)
+    ip_limiter.limit       = app.config.get("LOGIN_FAILURES_PER_IP", 30)
+    account_limiter.limit  = app.config.get("LOGIN_FAILURES_PER_ACCOUNT", 5)
+    ip_limiter.window = account_limiter.window = window
+    app.extensions["passwords"] = hasher
+    return hasher
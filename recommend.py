@@ -0,0 +1,405 @@
+"""
+"Similar recipes" and "recommended for you".
+
+Every recipe is a TF-IDF weighted, L2-normalised vector over the
+ingredient vocabulary (data/ingredients_units.csv), taken from its
+recipe_ingredient rows, so cosine similarity is a dot product and a block
+of recipes is scored against all others with one matrix product.
+
+Each recipe's NEIGHBORS most similar public recipes are stored in
+recipe_neighbor. `flask rebuild-recommendations` computes every list
+offline; uploads, edits and deletes then patch the affected lists in
+place. A user's taste vector is the weighted sum of their favorites and
+ratings, and their recommendations are the recipes closest to it, cached
+per user until they rate or favorite something.
+
+NumPy is imported on first use, so it doesn't slow down app start-up.
+"""
+import threading
+import time
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import joinedload
+
+from cache import LRUCache
+from ingredients import INGREDIENTS_UNITS
+from models import db, Recipe, RecipeIngredient, RecipeNeighbor, Rating, favorites
+
+NEIGHBORS       = 8        # similar recipes kept per recipe
+BLOCK_ROWS      = 256      # recipes scored per matrix product when rebuilding
+FAVORITE_WEIGHT = 1.0
+# rating → pull towards (or push away from) a recipe in the taste vector
+RATING_WEIGHTS  = {1: -1.0, 2: -0.5, 3: 0.0, 4: 0.5, 5: 1.0}
+USER_CACHE_TTL  = 300      # seconds a user's recommendations are reused
+MAX_RECOMMENDED = 100      # ids computed (and cached) per user; callers take a prefix
+# a changed recipe is offered to at most this many other lists, best first
+MAX_ENTERING    = 256
+
+
+class RecipeVectors:
+    """
+    This worker's recipe × ingredient matrix. Built from the database on
+    first use, patched by set_recipe()/drop_recipe(), and rebuilt after
+    `max_age` seconds to pick up other workers' changes.
+
+    Alongside it, `weakest` holds the lowest score on each recipe's stored
+    neighbor list (0 while the list is short), so a changed recipe only has
+    to be offered to the lists it can actually enter.
+    """
+
+    def __init__(self, max_age=3600):
+        self.max_age   = max_age
+        self.lock      = threading.RLock()
+        self.terms     = {name: i for i, name in enumerate(sorted(INGREDIENTS_UNITS))}
+        self.matrix    = None      # float32 [capacity × terms]; rows < size are live
+        self.ids       = None      # recipe id per row
+        self.public    = None      # is the row's recipe public?
+        self.weakest   = None
+        self.idf       = None
+        self.rows      = {}        # recipe id → row
+        self.size      = 0
+        self._built_at = 0.0
+
+    def invalidate(self):
+        with self.lock:
+            self.matrix = None
+
+    def ensure_built(self):
+        if self.matrix is not None and time.monotonic() - self._built_at < self.max_age:
+            return
+        import numpy as np
+
+        recipes = db.session.execute(
+            select(Recipe.id, Recipe.is_public).order_by(Recipe.id)
+        ).all()
+        n = len(recipes)
+        ids    = np.array([r.id for r in recipes], dtype=np.int64)
+        public = np.array([bool(r.is_public) for r in recipes], dtype=bool)
+        rows   = {recipe_id: i for i, recipe_id in enumerate(ids.tolist())}
+
+        present = np.zeros((max(n, 1), len(self.terms)), dtype=np.float32)
+        pairs = db.session.execute(
+            select(RecipeIngredient.recipe_id, RecipeIngredient.ingredient)
+            .where(RecipeIngredient.ingredient.in_(list(self.terms)))
+        )
+        hits = [(rows[r], self.terms[i]) for r, i in pairs if r in rows]
+        if hits:
+            row_idx, term_idx = zip(*hits)
+            present[list(row_idx), list(term_idx)] = 1.0
+
+        # smoothed idf: an ingredient in every recipe still counts a little
+        df = present[:n].sum(axis=0)
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        matrix = present * self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        weakest = np.zeros(max(n, 1), dtype=np.float32)
+        for recipe_id, low, count in db.session.execute(
+            select(RecipeNeighbor.recipe_id, db.func.min(RecipeNeighbor.score), db.func.count())
+            .group_by(RecipeNeighbor.recipe_id)
+        ):
+            if recipe_id in rows and count >= NEIGHBORS:
+                weakest[rows[recipe_id]] = low
+
+        self.matrix, self.ids, self.public = matrix, ids, public
+        self.weakest, self.rows, self.size = weakest, rows, n
+        self._built_at = time.monotonic()
+
+    def vector(self, ingredients):
+        import numpy as np
+
+        vec = np.zeros(len(self.terms), dtype=np.float32)
+        for name in ingredients:
+            if name in self.terms:
+                vec[self.terms[name]] = self.idf[self.terms[name]]
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _grow(self):
+        import numpy as np
+
+        capacity = max(16, int(len(self.ids) * 1.5))
+        self.matrix  = np.resize(self.matrix, (capacity, len(self.terms)))
+        self.ids     = np.resize(self.ids, capacity)
+        self.public  = np.resize(self.public, capacity)
+        self.weakest = np.resize(self.weakest, capacity)
+
+    def set_recipe(self, recipe_id, ingredients, is_public):
+        """Store a recipe's vector (adding a row if it is new); returns the vector."""
+        vec = self.vector(ingredients)
+        row = self.rows.get(recipe_id)
+        if row is None:
+            if self.size == len(self.ids):
+                self._grow()
+            row = self.rows[recipe_id] = self.size
+            self.size += 1
+            self.ids[row] = recipe_id
+            self.weakest[row] = 0
+        self.matrix[row] = vec
+        self.public[row] = is_public
+        return vec
+
+    def drop_recipe(self, recipe_id):
+        row = self.rows.get(recipe_id)
+        if row is not None:
+            self.matrix[row] = 0
+            self.public[row] = False
+
+    def top_k(self, vectors, k, exclude=()):
+        """
+        Best public matches for each row of `vectors` (2-D), as
+        [[(recipe_id, score)]], skipping recipes in `exclude` (a set or a
+        list of sets, one per row) and non-positive scores.
+        """
+        import numpy as np
+
+        n = self.size
+        scores = vectors @ self.matrix[:n].T
+        scores[:, ~self.public[:n]] = -1
+        results = []
+        for i, row_scores in enumerate(scores):
+            skip = exclude[i] if isinstance(exclude, list) else exclude
+            for recipe_id in skip:
+                if recipe_id in self.rows:
+                    row_scores[self.rows[recipe_id]] = -1
+            take = min(k, n)
+            best = np.argpartition(row_scores, -take)[-take:] if take < n else np.arange(n)
+            best = best[np.argsort(-row_scores[best])]
+            results.append([
+                (int(self.ids[j]), float(row_scores[j])) for j in best if row_scores[j] > 0
+            ])
+        return results
+
+
+vectors = RecipeVectors()
+
+
+def _write_lists(lists):
+    """Replace the stored neighbor lists {recipe_id: [(neighbor_id, score)]}."""
+    if not lists:
+        return
+    db.session.execute(
+        delete(RecipeNeighbor).where(RecipeNeighbor.recipe_id.in_(list(lists)))
+    )
+    rows = [
+        {"recipe_id": recipe_id, "neighbor_id": neighbor_id, "score": score}
+        for recipe_id, pairs in lists.items()
+        for neighbor_id, score in pairs
+    ]
+    if rows:
+        db.session.execute(insert(RecipeNeighbor.__table__), rows)
+    for recipe_id, pairs in lists.items():
+        row = vectors.rows.get(recipe_id)
+        if row is not None:
+            vectors.weakest[row] = pairs[-1][1] if len(pairs) >= NEIGHBORS else 0
+
+
+def _recompute(recipe_ids):
+    """Recompute whole neighbor lists for `recipe_ids` in one matrix product."""
+    recipe_ids = [r for r in recipe_ids if r in vectors.rows]
+    if not recipe_ids:
+        return {}
+    rows = [vectors.rows[r] for r in recipe_ids]
+    found = vectors.top_k(vectors.matrix[rows], NEIGHBORS, [{r} for r in recipe_ids])
+    return dict(zip(recipe_ids, found))
+
+
+def update_recipe(recipe_id):
+    """
+    Refresh one recipe after an upload or edit: its vector, its own
+    neighbor list, and every list it has left or can now enter. Commits.
+    """
+    import numpy as np
+
+    is_public = db.session.execute(
+        select(Recipe.is_public).where(Recipe.id == recipe_id)
+    ).scalar()
+    if is_public is None:
+        return remove_recipe(recipe_id)
+    ingredients = db.session.execute(
+        select(RecipeIngredient.ingredient).where(RecipeIngredient.recipe_id == recipe_id)
+    ).scalars().all()
+
+    with vectors.lock:
+        vectors.ensure_built()
+        vec = vectors.set_recipe(recipe_id, ingredients, bool(is_public))
+        lists = {recipe_id: vectors.top_k(vec[None, :], NEIGHBORS, {recipe_id})[0]}
+
+        # lists that held the old version: recompute them without it
+        holders = set(db.session.execute(
+            select(RecipeNeighbor.recipe_id).where(RecipeNeighbor.neighbor_id == recipe_id)
+        ).scalars()) - {recipe_id}
+        db.session.execute(delete(RecipeNeighbor).where(RecipeNeighbor.neighbor_id == recipe_id))
+        lists.update(_recompute(holders))
+
+        if is_public:
+            # lists whose weakest entry it now beats
+            n = vectors.size
+            scores = vectors.matrix[:n] @ vec
+            scores[vectors.rows[recipe_id]] = 0
+            entering = np.nonzero(scores > vectors.weakest[:n])[0]
+            entering = entering[np.argsort(-scores[entering])][:MAX_ENTERING]
+            stored = {}
+            for holder, neighbor_id, score in db.session.execute(
+                select(RecipeNeighbor.recipe_id, RecipeNeighbor.neighbor_id, RecipeNeighbor.score)
+                .where(RecipeNeighbor.recipe_id.in_(
+                    [int(vectors.ids[j]) for j in entering if int(vectors.ids[j]) not in lists]
+                ))
+            ):
+                stored.setdefault(holder, []).append((neighbor_id, score))
+            for j in entering:
+                holder = int(vectors.ids[j])
+                if holder in lists:
+                    continue
+                pairs = stored.get(holder, []) + [(recipe_id, float(scores[j]))]
+                lists[holder] = sorted(pairs, key=lambda p: -p[1])[:NEIGHBORS]
+
+        _write_lists(lists)
+        db.session.commit()
+
+
+def remove_recipe(recipe_id):
+    """Forget a deleted (or now missing) recipe and repair lists that held it. Commits."""
+    with vectors.lock:
+        vectors.ensure_built()
+        vectors.drop_recipe(recipe_id)
+        holders = set(db.session.execute(
+            select(RecipeNeighbor.recipe_id).where(RecipeNeighbor.neighbor_id == recipe_id)
+        ).scalars())
+        db.session.execute(delete(RecipeNeighbor).where(
+            (RecipeNeighbor.recipe_id == recipe_id) | (RecipeNeighbor.neighbor_id == recipe_id)
+        ))
+        _write_lists(_recompute(holders - {recipe_id}))
+        db.session.commit()
+
+
+def rebuild(block_rows=BLOCK_ROWS, progress=None):
+    """
+    Recompute every recipe's neighbor list from scratch, `block_rows`
+    recipes per matrix product. Returns the number of lists written.
+    """
+    import numpy as np
+
+    with vectors.lock:
+        vectors.invalidate()
+        vectors.ensure_built()
+        n = vectors.size
+        matrix = vectors.matrix[:n]
+        candidates = np.nonzero(vectors.public[:n])[0]
+        pool = matrix[candidates]
+        k = min(NEIGHBORS, len(candidates))
+        # row → its column in `pool`, -1 for private recipes
+        column = np.full(n, -1)
+        column[candidates] = np.arange(len(candidates))
+
+        db.session.execute(delete(RecipeNeighbor))
+        written = 0
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            scores = matrix[start:stop] @ pool.T
+            # a recipe is not its own neighbor
+            own = column[start:stop]
+            listed = np.nonzero(own >= 0)[0]
+            scores[listed, own[listed]] = -1
+
+            if k:
+                best = np.argpartition(scores, -k, axis=1)[:, -k:]
+                best_scores = np.take_along_axis(scores, best, axis=1)
+                order = np.argsort(-best_scores, axis=1)
+                best = np.take_along_axis(best, order, axis=1)
+                best_scores = np.take_along_axis(best_scores, order, axis=1)
+            else:
+                best = best_scores = np.zeros((stop - start, 0))
+
+            rows = []
+            for i in range(stop - start):
+                recipe_id = int(vectors.ids[start + i])
+                pairs = [
+                    (int(vectors.ids[candidates[j]]), float(s))
+                    for j, s in zip(best[i], best_scores[i]) if s > 0
+                ]
+                rows.extend(
+                    {"recipe_id": recipe_id, "neighbor_id": neighbor_id, "score": score}
+                    for neighbor_id, score in pairs
+                )
+                vectors.weakest[start + i] = pairs[-1][1] if len(pairs) >= NEIGHBORS else 0
+            if rows:
+                db.session.execute(insert(RecipeNeighbor.__table__), rows)
+            written += stop - start
+            if progress:
+                progress(written, n)
+        db.session.commit()
+    _user_cache.clear()
+    return written
+
+
+def _neighbors(query, recipe_id, limit):
+    return (
+        query
+        .join(RecipeNeighbor, RecipeNeighbor.neighbor_id == Recipe.id)
+        .filter(RecipeNeighbor.recipe_id == recipe_id, Recipe.is_public.is_(True))
+        .order_by(RecipeNeighbor.score.desc())
+        .limit(limit)
+    )
+
+
+def similar_recipes(recipe_id, limit=NEIGHBORS):
+    """Stored neighbors of a recipe that are (still) public, authors loaded."""
+    return _neighbors(
+        Recipe.query.options(joinedload(Recipe.user)), recipe_id, limit
+    ).all()
+
+
+def similar_keys(recipe_id, limit=NEIGHBORS):
+    """(id, version) of what similar_recipes() returns, for validators."""
+    return _neighbors(
+        db.session.query(Recipe.id, Recipe.version), recipe_id, limit
+    ).all()
+
+
+_user_cache = LRUCache(10000)
+
+
+def invalidate_user(user_id):
+    _user_cache.delete(user_id)
+
+
+def recommended_ids(user_id, limit=24):
+    """
+    Ids of the public recipes closest to the user's taste, best first;
+    recipes they wrote, rated or favorited are left out. At most
+    MAX_RECOMMENDED, whatever `limit` asks for.
+    """
+    import numpy as np
+
+    cached = _user_cache.get(user_id)
+    if cached is not None and time.monotonic() - cached[0] < USER_CACHE_TTL:
+        return cached[1][:limit]
+
+    weights = {}
+    for (recipe_id,) in db.session.execute(
+        select(favorites.c.recipe_id).where(favorites.c.user_id == user_id)
+    ):
+        weights[recipe_id] = weights.get(recipe_id, 0) + FAVORITE_WEIGHT
+    for recipe_id, score in db.session.execute(
+        select(Rating.recipe_id, Rating.score).where(Rating.user_id == user_id)
+    ):
+        weights[recipe_id] = weights.get(recipe_id, 0) + RATING_WEIGHTS.get(score, 0)
+    own = set(db.session.execute(
+        select(Recipe.id).where(Recipe.user_id == user_id)
+    ).scalars())
+
+    with vectors.lock:
+        vectors.ensure_built()
+        known = [(vectors.rows[r], w) for r, w in weights.items() if r in vectors.rows and w]
+        if known:
+            rows, w = zip(*known)
+            taste = np.asarray(w, dtype=np.float32) @ vectors.matrix[list(rows)]
+            # the full list is cached, so every page size reads from it
+            found = vectors.top_k(taste[None, :], MAX_RECOMMENDED, set(weights) | own)[0]
+        else:
+            found = []
+    ids = [recipe_id for recipe_id, _ in found]
+    _user_cache.set(user_id, (time.monotonic(), ids))
+    return ids[:limit]
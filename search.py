@@ -0,0 +1,113 @@
+"""
+Full-text recipe search backed by an SQLite FTS5 index.
+
+recipe_fts is an external-content FTS5 table over recipe.title,
+recipe.ingredients and recipe.instructions. Triggers on the recipe table
+keep it in sync, so upload(), edit_recipe() and delete_recipe() need no
+extra bookkeeping.
+"""
+import re
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import joinedload
+
+from models import db, Recipe
+
+# bm25 column weights: a hit in the title beats one in the ingredients,
+# which beats one buried in the method
+TITLE_WEIGHT        = 10.0
+INGREDIENTS_WEIGHT  = 5.0
+INSTRUCTIONS_WEIGHT = 1.0
+
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipe_fts USING fts5(
+        title, ingredients, instructions,
+        content='recipe', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipe_fts_ai AFTER INSERT ON recipe BEGIN
+        INSERT INTO recipe_fts(rowid, title, ingredients, instructions)
+        VALUES (new.id, new.title, new.ingredients, new.instructions);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipe_fts_ad AFTER DELETE ON recipe BEGIN
+        INSERT INTO recipe_fts(recipe_fts, rowid, title, ingredients, instructions)
+        VALUES ('delete', old.id, old.title, old.ingredients, old.instructions);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipe_fts_au
+    AFTER UPDATE OF title, ingredients, instructions ON recipe BEGIN
+        INSERT INTO recipe_fts(recipe_fts, rowid, title, ingredients, instructions)
+        VALUES ('delete', old.id, old.title, old.ingredients, old.instructions);
+        INSERT INTO recipe_fts(rowid, title, ingredients, instructions)
+        VALUES (new.id, new.title, new.ingredients, new.instructions);
+    END
+    """,
+]
+
+
+def install_search_index():
+    """Create the FTS table and triggers, indexing existing recipes once."""
+    is_new = not inspect(db.engine).has_table('recipe_fts')
+    with db.engine.begin() as conn:
+        for statement in SEARCH_DDL:
+            conn.execute(text(statement))
+        if is_new:
+            conn.execute(text(
+                "INSERT INTO recipe_fts(recipe_fts) VALUES ('rebuild')"
+            ))
+
+
+def build_match_query(q):
+    """
+    Turn free text into a safe FTS5 MATCH expression: every word must
+    appear, and the last one may be a prefix (search-as-you-type).
+    Returns None when there is nothing to search for.
+    """
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+
+def search_recipes(q, page=1, per_page=24):
+    """
+    Return (recipes, has_next) for one bm25-ranked page of public recipes
+    matching `q`, authors eager-loaded.
+    """
+    match = build_match_query(q)
+    if match is None:
+        return [], False
+
+    rows = db.session.execute(
+        text(
+            "SELECT recipe.id FROM recipe_fts "
+            "JOIN recipe ON recipe.id = recipe_fts.rowid "
+            "WHERE recipe_fts MATCH :match AND recipe.is_public = 1 "
+            "ORDER BY bm25(recipe_fts, :w_title, :w_ingredients, :w_instructions), "
+            "recipe.id DESC "
+            "LIMIT :limit OFFSET :offset"
+        ),
+        {
+            "match":          match,
+            "w_title":        TITLE_WEIGHT,
+            "w_ingredients":  INGREDIENTS_WEIGHT,
+            "w_instructions": INSTRUCTIONS_WEIGHT,
+            "limit":          per_page + 1,
+            "offset":         (page - 1) * per_page,
+        }
+    ).scalars().all()
+
+    has_next = len(rows) > per_page
+    ids = rows[:per_page]
+    by_id = {
+        r.id: r for r in
+        Recipe.query.options(joinedload(Recipe.user)).filter(Recipe.id.in_(ids))
+    }
+    return [by_id[i] for i in ids if i in by_id], has_next
@@ -0,0 +1,69 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app                                    # noqa: E402
+from leaderboard import install_leaderboard                   # noqa: E402
+from models import db, upgrade_schema                         # noqa: E402
+from search import install_search_index                       # noqa: E402
+
+
+@pytest.fixture
+def app_config():
+    """Extra settings for `app`; override this fixture in a test module."""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    """An app on a fresh SQLite file, with no background workers or caches."""
+    app = create_app({
+        "TESTING":                 True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+        "SECRET_KEY":              "test",
+        "MAIL_OUTBOX_WORKERS":     0,
+        "IMAGE_WORKERS":           0,
+        "PASSWORD_HASH_WORKERS":   0,
+        "FRAGMENT_CACHE_SIZE":     0,
+        "USER_CACHE_SIZE":         0,
+        **app_config,
+    })
+    with app.app_context():
+        upgrade_schema()
+        install_search_index()
+        install_leaderboard()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count_statements(app):
+    """count_statements() is a context manager collecting the SQL run inside it."""
+    @contextmanager
+    def counting():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    return counting
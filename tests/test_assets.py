@@ -0,0 +1,28 @@
+"""`flask build-assets` still builds the site's own files when the CDN is unreachable."""
+import requests
+
+import assets
+
+
+class OfflineSession:
+    def get(self, url, **kwargs):
+        raise requests.ConnectionError(f"cannot reach {url}")
+
+
+def test_build_survives_unreachable_cdn(app, tmp_path, monkeypatch):
+    static = tmp_path / "static"
+    (static / "css").mkdir(parents=True)
+    (static / "css" / "site.css").write_text("body { color: red; }\n" * 100)
+    monkeypatch.setattr(app, "static_folder", str(static))
+    monkeypatch.setattr("utils.http_session", lambda: OfflineSession())
+
+    result = app.test_cli_runner().invoke(args=["build-assets"])
+
+    assert result.exit_code == 0, result.output
+    assert result.output.count("Skipped vendor/") == len(assets.VENDOR)
+    assert "css/site.css" in assets.assets.manifest
+    with app.test_request_context():
+        # not fetched: still on the CDN
+        name = "vendor/bootstrap/bootstrap.min.css"
+        assert assets.asset_url(name) == assets.VENDOR[name]
+    assets.assets.load(str(static / "missing.json"))
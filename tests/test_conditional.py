@@ -0,0 +1,24 @@
+"""A 304 for a recipe page is answered from cheap metadata reads."""
+from models import db, Recipe, User
+
+
+def test_recipe_revalidation_skips_page_queries(app, client, count_statements):
+    with app.app_context():
+        author = User(username="author", email="author@example.com", password="x")
+        reader = User(username="reader", email="reader@example.com", password="x")
+        recipe = Recipe(title="Soup", ingredients="water", instructions="boil", user=author)
+        db.session.add_all([author, reader, recipe])
+        db.session.commit()
+        recipe_id, reader_id = recipe.id, reader.id
+    with client.session_transaction() as session:
+        session["_user_id"] = str(reader_id)
+
+    first = client.get(f"/recipe/{recipe_id}")
+    assert first.status_code == 200
+
+    with count_statements() as statements:
+        again = client.get(f"/recipe/{recipe_id}", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    # no similar recipes with their authors, no viewer's rating
+    assert not any("JOIN user" in s for s in statements)
+    assert not any("FROM rating" in s for s in statements)
@@ -0,0 +1,15 @@
+"""The read-only engine opens the database the app was configured with."""
+import pytest
+
+from db_profile import READ_BIND
+
+
+@pytest.fixture
+def app_config():
+    return {"DB_READ_REPLICA": True}
+
+
+def test_replica_follows_overridden_database(app, tmp_path):
+    assert app.config["SQLALCHEMY_DATABASE_URI"] == f"sqlite:///{tmp_path / 'test.db'}"
+    bind = app.config["SQLALCHEMY_BINDS"][READ_BIND]["url"]
+    assert bind == f"sqlite:///file:{tmp_path / 'test.db'}?mode=ro&uri=true"
@@ -0,0 +1,46 @@
+"""The public feed costs the same number of SQL statements however many cards it shows."""
+import pytest
+
+from models import db, Rating, Recipe, User
+
+
+def add_recipes(count, start=0):
+    """`count` public recipes, each by its own author and rated by another user."""
+    for i in range(start, start + count):
+        author = User(username=f"author{i}", email=f"author{i}@example.com",
+                      password="x", is_verified=True)
+        rater = User(username=f"rater{i}", email=f"rater{i}@example.com",
+                     password="x", is_verified=True)
+        recipe = Recipe(title=f"Recipe {i}", ingredients="salt", instructions="cook",
+                        user=author)
+        db.session.add_all([author, rater, recipe])
+        db.session.flush()
+        db.session.add(Rating(score=1 + i % 5, user_id=rater.id, recipe_id=recipe.id))
+    db.session.commit()
+
+
+def statements_for(count_statements, client, path):
+    with count_statements() as statements:
+        response = client.get(path)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize("path", ["/", "/recipes", "/api/recipes?limit=50"])
+def test_feed_query_count_does_not_grow_with_page_size(app, client, count_statements, path):
+    with app.app_context():
+        add_recipes(2)
+    few = statements_for(count_statements, client, path)
+
+    with app.app_context():
+        add_recipes(40, start=2)
+    full = statements_for(count_statements, client, path)
+
+    assert full == few
+
+
+def test_api_limit_does_not_change_query_count(app, client, count_statements):
+    with app.app_context():
+        add_recipes(30)
+    assert statements_for(count_statements, client, "/api/recipes?limit=2") == \
+        statements_for(count_statements, client, "/api/recipes?limit=30")
@@ -0,0 +1,25 @@
+"""The shared fragment cache does not outlive a deploy."""
+from assets import assets
+from cache import FragmentCache, SQLiteBackend
+
+
+def test_new_asset_build_rerenders_shared_fragment(tmp_path, monkeypatch):
+    path = str(tmp_path / "fragments.db")
+    renders = []
+
+    def render():
+        renders.append(assets.version)
+        return f"<link href='/assets/site.{assets.version}.css'>"
+
+    before = FragmentCache()
+    before.configure(16, SQLiteBackend(path))
+    monkeypatch.setattr(assets, "version", "aaaaaaaa")
+    before.fetch("card", 1, 3, render)
+    assert before.fetch("card", 1, 3, render) == "<link href='/assets/site.aaaaaaaa.css'>"
+
+    # a worker of the next deploy: same recipe version, same shared file
+    after = FragmentCache()
+    after.configure(16, SQLiteBackend(path))
+    monkeypatch.setattr(assets, "version", "bbbbbbbb")
+    assert after.fetch("card", 1, 3, render) == "<link href='/assets/site.bbbbbbbb.css'>"
+    assert renders == ["aaaaaaaa", "bbbbbbbb"]
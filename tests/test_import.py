@@ -0,0 +1,58 @@
+"""Recipe import copes with untidy JSON-LD and with one bad page in a batch."""
+import json
+
+import pytest
+from bs4 import BeautifulSoup
+
+import utils
+
+MESSY_RECIPE = {
+    "@context": "https://schema.org",
+    "@graph": [{
+        "@type": ["Recipe"],
+        "name": "  Weeknight Dal ",
+        "image": [{"url": "https://example.com/dal.jpg"}],
+        "recipeIngredient": [
+            " 200 g red lentils ",
+            {"@type": "PropertyValue", "name": "1 onion"},
+            2,
+            None,
+            ["1 tsp cumin", {"value": 3}],
+        ],
+        "recipeInstructions": [
+            {"@type": "HowToStep", "text": ["not", "a", "string"]},
+            {"@type": "HowToStep", "text": " Rinse the lentils. "},
+            {"@type": "HowToSection", "itemListElement": [
+                {"@type": "HowToStep", "text": {"@value": 42}},
+                "Simmer until soft.",
+            ]},
+            17,
+        ],
+    }],
+}
+
+
+@pytest.fixture
+def messy_page():
+    return f'<script type="application/ld+json">{json.dumps(MESSY_RECIPE)}</script>'
+
+
+def test_parse_jsonld_skips_values_that_are_not_strings(messy_page):
+    data = utils.parse_jsonld(BeautifulSoup(messy_page, "html.parser"))
+    assert data["title"] == "Weeknight Dal"
+    assert data["ingredients"] == ["200 g red lentils", "1 onion", "2", "1 tsp cumin"]
+    assert data["instructions"] == ["Rinse the lentils.", "Simmer until soft.", "17"]
+
+
+def test_import_many_survives_a_failing_page(monkeypatch, messy_page):
+    pages = {"https://example.com/dal": messy_page}
+
+    def fetch_page(url, timeout=None):
+        if url not in pages:
+            raise RuntimeError("parser exploded")
+        return pages[url]
+
+    monkeypatch.setattr(utils, "fetch_page", fetch_page)
+    results = dict(utils.import_many(["https://example.com/broken", "https://example.com/dal"]))
+    assert results["https://example.com/broken"] is None
+    assert results["https://example.com/dal"]["title"] == "Weeknight Dal"
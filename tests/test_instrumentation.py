@@ -0,0 +1,38 @@
+"""SQL timing survives failing statements; /metrics is opt-in."""
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from models import db
+
+
+@pytest.fixture
+def app_config():
+    return {"PERF_INSTRUMENTATION": True}
+
+
+def test_failed_statement_leaves_nothing_on_the_connection(app):
+    with app.test_request_context():
+        app.preprocess_request()
+        connection = db.session.connection()
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM no_such_table"))
+        connection.execute(text("SELECT 1"))
+        assert g.perf.sql_count == 1
+        # pooled connections live on: nothing per statement may pile up there
+        assert not connection.info.get("perf_started")
+
+
+def test_metrics_only_with_instrumentation(app, client, tmp_path):
+    assert client.get("/metrics").status_code == 200
+    plain = create_app({
+        "TESTING":                 True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'plain.db'}",
+        "MAIL_OUTBOX_WORKERS":     0,
+        "IMAGE_WORKERS":           0,
+        "PASSWORD_HASH_WORKERS":   0,
+    })
+    assert plain.test_client().get("/metrics").status_code == 404
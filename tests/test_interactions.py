@@ -0,0 +1,52 @@
+"""Batch favorites accept only JSON booleans, ratings only JSON integers."""
+import pytest
+
+from interactions import InteractionError, apply_batch
+from models import db, Rating, Recipe, User, favorites
+
+
+@pytest.fixture
+def recipe_and_user(app):
+    with app.app_context():
+        author = User(username="author", email="author@example.com", password="x")
+        fan = User(username="fan", email="fan@example.com", password="x")
+        recipe = Recipe(title="Soup", ingredients="water", instructions="boil", user=author)
+        db.session.add_all([author, fan, recipe])
+        db.session.commit()
+        yield recipe.id, fan.id
+
+
+@pytest.mark.parametrize("value", ["false", "0", 0, 1, None])
+def test_non_boolean_favorite_rejects_the_batch(app, recipe_and_user, value):
+    recipe_id, user_id = recipe_and_user
+    with pytest.raises(InteractionError) as raised:
+        apply_batch(user_id, {"favorites": {str(recipe_id): value}, "ratings": {str(recipe_id): 4}})
+    assert raised.value.status == 400
+    assert db.session.query(favorites).count() == 0
+
+
+def test_boolean_favorites_apply(app, recipe_and_user):
+    recipe_id, user_id = recipe_and_user
+    results, errors, touched = apply_batch(user_id, {"favorites": {str(recipe_id): True}})
+    assert results["favorites"] == {str(recipe_id): True}
+    assert touched == {recipe_id}
+    assert db.session.query(favorites).count() == 1
+
+
+@pytest.mark.parametrize("score", [True, False, 4.5, 4.0, "4", None])
+def test_non_integer_rating_rejects_the_batch(app, recipe_and_user, score):
+    recipe_id, user_id = recipe_and_user
+    with pytest.raises(InteractionError) as raised:
+        apply_batch(user_id, {"ratings": {str(recipe_id): score}})
+    assert raised.value.status == 400
+    assert db.session.query(Rating).count() == 0
+
+
+def test_rate_form_rejects_fractional_score(app, client, recipe_and_user):
+    recipe_id, user_id = recipe_and_user
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+    assert client.post(f"/rate/{recipe_id}", data={"score": "4.5"}).status_code == 400
+    assert client.post(f"/rate/{recipe_id}", data={"score": "4"}).status_code == 302
+    with app.app_context():
+        assert db.session.query(Rating.score).scalar() == 4
@@ -0,0 +1,38 @@
+"""Claims expire, failures back off and then give up."""
+from datetime import timedelta
+
+from images import queue
+from models import db, ImageSource, utcnow
+
+
+def test_expired_claim_is_handed_out_again(app):
+    with app.app_context():
+        db.session.add(ImageSource(url="https://example.com/a.jpg"))
+        db.session.commit()
+        [row] = queue.claim()
+        assert queue.claim() == []
+
+        db.session.get(ImageSource, row.id).claimed_at = utcnow() - queue.lease - timedelta(seconds=1)
+        db.session.commit()
+        assert [r.id for r in queue.claim()] == [row.id]
+
+
+def test_failures_back_off_then_give_up(app):
+    with app.app_context():
+        db.session.add(ImageSource(url="https://example.com/b.jpg"))
+        db.session.commit()
+        for attempt in range(1, queue.max_attempts + 1):
+            source = db.session.get(ImageSource, 1)
+            source.next_attempt_at = utcnow()
+            db.session.commit()
+            [row] = queue.claim()
+            queue.fail(row, ValueError("not an image"))
+            db.session.commit()
+            db.session.expire_all()
+            source = db.session.get(ImageSource, 1)
+            assert source.attempts == attempt
+            if attempt < queue.max_attempts:
+                assert source.status == "pending"
+                assert source.next_attempt_at > utcnow()
+        assert source.status == "failed"
+        assert source.last_error == "not an image"
@@ -0,0 +1,58 @@
+"""Login throttling counts failures per client address, not every login."""
+import pytest
+
+from models import db, User
+from passwords import account_limiter, hasher, ip_limiter
+
+PASSWORD = "correct horse"
+
+
+@pytest.fixture
+def app_config():
+    return {
+        "PASSWORD_HASH_METHOD":       "pbkdf2:sha256:1000",
+        "PASSWORD_HASH_TIMEOUT":      3,
+        "LOGIN_FAILURES_PER_IP":      3,
+        "LOGIN_FAILURES_PER_ACCOUNT": 100,
+        "TRUSTED_PROXIES":            1,
+    }
+
+
+@pytest.fixture
+def users(app):
+    with app.app_context():
+        db.session.add_all(
+            User(username=f"user{i}", email=f"user{i}@example.com",
+                 password=hasher.hash_password(PASSWORD), is_verified=True)
+            for i in range(5)
+        )
+        db.session.commit()
+    yield
+    # the limiters are process-wide
+    for address in ("203.0.113.7", "198.51.100.9"):
+        ip_limiter.reset(address)
+    for i in range(5):
+        account_limiter.reset(f"user{i}@example.com")
+
+
+def log_in(client, email, password, address="203.0.113.7"):
+    return client.post("/login", data={"email": email, "password": password},
+                       headers={"X-Forwarded-For": address})
+
+
+def test_successful_logins_are_not_throttled(client, users):
+    for i in range(10):
+        assert log_in(client, f"user{i % 5}@example.com", PASSWORD).status_code == 302
+        client.get("/logout")
+
+
+def test_failures_throttle_the_address(client, users):
+    for i in range(3):
+        assert log_in(client, f"user{i}@example.com", "wrong").status_code == 200
+    assert log_in(client, "user4@example.com", PASSWORD).status_code == 429
+    # another client behind the same proxy is not affected
+    assert log_in(client, "user4@example.com", PASSWORD, "198.51.100.9").status_code == 302
+
+
+def test_hash_timeout_comes_from_config(app):
+    assert hasher.timeout == 3
@@ -0,0 +1,47 @@
+"""Queued mail reaches an SMTP server and its outbox row is marked sent."""
+import threading
+
+import pytest
+
+import outbox
+from app import mail
+from models import db, OutboxMessage
+
+
+@pytest.fixture
+def sink():
+    server = outbox.MailSink(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def app_config(sink):
+    return {
+        "MAIL_SERVER":         "127.0.0.1",
+        "MAIL_PORT":           sink.server_address[1],
+        "MAIL_USE_TLS":        False,
+        "MAIL_USERNAME":       None,
+        "MAIL_PASSWORD":       None,
+        "MAIL_DEFAULT_SENDER": "club@example.com",
+        "MAIL_SUPPRESS_SEND":  False,          # TESTING would swallow it
+    }
+
+
+def test_queued_mail_is_sent_through_the_sink(app, sink):
+    with app.app_context():
+        outbox.queue_mail("Welcome", ["cook@example.com"], "Hello!")
+        db.session.commit()
+
+        rows = outbox.queue.claim()
+        assert outbox.send_batch(mail, rows) == 1
+
+        message = db.session.get(OutboxMessage, rows[0].id)
+        assert message.status == "sent"
+        assert message.last_error is None
+    assert len(sink.messages) == 1
+    assert b"Hello!" in sink.messages[0]["data"]
+    assert sink.messages[0]["to"] == ["<cook@example.com>"]
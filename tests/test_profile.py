@@ -0,0 +1,36 @@
+"""Favorites pagination on the profile page."""
+import app as app_module
+from models import db, Recipe, User, favorites
+from user_cache import user_cache
+
+
+def test_deleted_favorite_does_not_end_pagination(app, client, monkeypatch):
+    monkeypatch.setattr(app_module, "FEED_PAGE_SIZE", 3)
+    with app.app_context():
+        author = User(username="author", email="author@example.com", password="x")
+        fan = User(username="fan", email="fan@example.com", password="x")
+        recipes = [
+            Recipe(title=f"Dish {i}", ingredients="salt", instructions="cook", user=author)
+            for i in range(7)
+        ]
+        db.session.add_all([author, fan, *recipes])
+        db.session.commit()
+        ids = sorted((r.id for r in recipes), reverse=True)
+        db.session.execute(favorites.insert(), [{"user_id": fan.id, "recipe_id": i} for i in ids])
+        db.session.commit()
+        fan_id = fan.id
+    with client.session_transaction() as session:
+        session["_user_id"] = str(fan_id)
+
+    # the user snapshot is loaded, then a favorited recipe disappears behind its back
+    user_cache.configure(10, 60)
+    try:
+        assert client.get("/profile").status_code == 200
+        with app.app_context():
+            db.session.execute(db.delete(Recipe).where(Recipe.id == ids[1]))
+            db.session.commit()
+        page = client.get("/profile").get_data(as_text=True)
+    finally:
+        user_cache.configure(0)
+
+    assert f"favorites_before={ids[2]}" in page
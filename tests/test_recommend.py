@@ -0,0 +1,28 @@
+"""Cached recommendations serve every page size."""
+import recommend
+from ingredients import sync_recipe_ingredients
+from interactions import set_favorite
+from models import db, Recipe, User
+
+
+def test_small_limit_does_not_shrink_later_pages(app):
+    with app.app_context():
+        author = User(username="author", email="author@example.com", password="x")
+        fan = User(username="fan", email="fan@example.com", password="x")
+        db.session.add_all([author, fan])
+        recipes = [
+            Recipe(title=f"Soup {i}", ingredients=f"1 onion\n2 carrot\n{i} potato\nsalt {i}",
+                   instructions="boil", user=author)
+            for i in range(10)
+        ]
+        db.session.add_all(recipes)
+        db.session.flush()
+        for recipe in recipes:
+            sync_recipe_ingredients(recipe)
+        set_favorite(fan.id, recipes[0].id, True)
+        db.session.commit()
+        recommend.vectors.invalidate()
+        recommend.invalidate_user(fan.id)
+
+        assert len(recommend.recommended_ids(fan.id, 2)) == 2
+        assert len(recommend.recommended_ids(fan.id, 5)) == 5
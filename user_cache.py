@@ -0,0 +1,127 @@
+"""
+Per-worker cache of the logged-in user.
+
+Flask-Login calls load_user() on every authenticated request. Instead of
+a User row (plus a favorites query whenever a page asks "is this
+favorited?"), it gets a UserSnapshot: id, username, verification flag and
+the set of favorite recipe ids, loaded with two queries and then served
+from an LRU for up to `ttl` seconds.
+
+Another worker's copy can be stale for that long. The user's own changes
+are seen everywhere at once: whoever changes favorites calls
+mark_changed(), which drops this worker's copy and puts a new stamp in
+the session cookie, and a snapshot loaded under a different stamp is
+reloaded.
+"""
+import threading
+import time
+
+from flask import session
+from sqlalchemy import select
+
+from cache import LRUCache
+from models import db, User, favorites
+
+SESSION_KEY = "user_stamp"
+
+
+class UserSnapshot:
+    """What a request needs to know about its user; stands in for User as current_user."""
+    __slots__ = ("id", "username", "is_verified", "favorite_ids", "stamp", "loaded_at")
+
+    is_authenticated = True
+    is_active        = True
+    is_anonymous     = False
+
+    def __init__(self, id, username, is_verified, favorite_ids, stamp=None):
+        self.id           = id
+        self.username     = username
+        self.is_verified  = is_verified
+        self.favorite_ids = favorite_ids
+        self.stamp        = stamp
+        self.loaded_at    = time.monotonic()
+
+    def get_id(self):
+        return str(self.id)
+
+
+class UserCache:
+    """LRU of UserSnapshots with a TTL, plus hit/miss counters."""
+
+    def __init__(self, max_entries=10000, ttl=60):
+        self.configure(max_entries, ttl)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def configure(self, max_entries=10000, ttl=60):
+        self.ttl     = ttl
+        self.entries = LRUCache(max_entries) if max_entries else None
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def load(self, user_id, stamp=None):
+        """The snapshot of `user_id`, or None if there is no such user."""
+        if self.entries is not None:
+            snapshot = self.entries.get(user_id)
+            if (
+                snapshot is not None
+                and snapshot.stamp == stamp
+                and time.monotonic() - snapshot.loaded_at < self.ttl
+            ):
+                self._count("hits")
+                return snapshot
+        self._count("misses")
+
+        row = db.session.execute(
+            select(User.username, User.is_verified).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        favorite_ids = frozenset(db.session.execute(
+            select(favorites.c.recipe_id).where(favorites.c.user_id == user_id)
+        ).scalars())
+        snapshot = UserSnapshot(user_id, row.username, bool(row.is_verified), favorite_ids, stamp)
+        if self.entries is not None:
+            self.entries.set(user_id, snapshot)
+        return snapshot
+
+    def invalidate(self, user_id):
+        if self.entries is not None:
+            self.entries.delete(user_id)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "entries":   len(self.entries) if self.entries is not None else 0,
+        }
+
+
+user_cache = UserCache()
+
+
+def session_stamp():
+    return session.get(SESSION_KEY)
+
+
+def mark_changed(user_id):
+    """
+    The user's favorites (or account) changed in this request: forget this
+    worker's copy and re-stamp the session so other workers reload too.
+    """
+    user_cache.invalidate(user_id)
+    session[SESSION_KEY] = time.time_ns()
+
+
+def init_app(app):
+    """Configure from USER_CACHE_SIZE (entries, 0 disables) and USER_CACHE_TTL (seconds)."""
+    user_cache.configure(
+        app.config.get("USER_CACHE_SIZE", 10000),
+        app.config.get("USER_CACHE_TTL", 60)
+    )
+    app.extensions["user_cache"] = user_cache
+    return user_cache
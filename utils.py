@@ -1,22 +1,214 @@
-import requests
-from bs4 import BeautifulSoup
+"""
+Recipe import engine.
+
+A page is fetched once, through a shared pooled HTTP session, and kept in
+a small content-addressed cache. The recipe is then extracted from that
+one copy: Schema.org JSON-LD first, recipe-scrapers as a fallback, and
+OpenGraph metadata (title and image only) as a last resort.
+
+The scraping stack (requests, BeautifulSoup, recipe-scrapers) is imported
+on first use, so importing this module costs the web app and CLI nothing.
+"""
+import hashlib
 import json
-import requests
-from bs4 import BeautifulSoup
-from recipe_scrapers import scrape_me
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from blinker import Namespace
+
+FETCH_TIMEOUT   = (3.05, 10)   # seconds: connect, read
+POOL_SIZE       = 16           # keep-alive connections per host
+IMPORT_WORKERS  = 8            # default concurrency of import_many()
+USER_AGENT      = "RecipeClub/1.0 (+recipe import)"
+
+log = logging.getLogger(__name__)
+
+# Sent after every network fetch with `url` and `seconds` (not for cache hits)
+page_fetched = Namespace().signal("page-fetched")
+
+_session      = None
+_session_lock = threading.Lock()
+
+
+def http_session():
+    """The process-wide requests session: pooled, keep-alive, light retries."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_SIZE,
+                    pool_maxsize=POOL_SIZE,
+                    max_retries=Retry(
+                        total=2,
+                        backoff_factor=0.3,
+                        status_forcelist=(502, 503, 504),
+                        allowed_methods=("GET", "HEAD"),
+                    ),
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["User-Agent"] = USER_AGENT
+                _session = session
+    return _session
+
 
-def extract_jsonld_recipe(url, timeout=10):
+class PageCache:
     """
-    Fetch the page and extract Schema.org JSON-LD Recipe data if present.
-    Returns a dict {title, ingredients: [str], instructions: [str]} or None.
+    Fetched pages, content-addressed: URLs map to a sha256 digest and each
+    distinct body is stored once, however many URLs point at it.
+
+    URL entries expire after `ttl` seconds and the least recently used ones
+    are evicted once more than `max_bytes` of bodies are held.
     """
-    try:
-        resp = requests.get(url, timeout=timeout)
-        resp.raise_for_status()
-    except requests.RequestException:
-        return None
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+    def __init__(self, ttl=3600, max_bytes=32 * 1024 * 1024):
+        self.ttl       = ttl
+        self.max_bytes = max_bytes
+        self._urls     = OrderedDict()   # url → (digest, fetched_at)
+        self._bodies   = {}              # digest → [text, refcount]
+        self._size     = 0
+        self._lock     = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            entry = self._urls.get(url)
+            if entry is None:
+                return None
+            digest, fetched_at = entry
+            if time.monotonic() - fetched_at > self.ttl:
+                self._drop(url)
+                return None
+            self._urls.move_to_end(url)
+            return self._bodies[digest][0]
+
+    def put(self, url, text):
+        digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+        with self._lock:
+            if url in self._urls:
+                self._drop(url)
+            body = self._bodies.get(digest)
+            if body is None:
+                self._bodies[digest] = [text, 1]
+                self._size += len(text)
+            else:
+                body[1] += 1
+            self._urls[url] = (digest, time.monotonic())
+            while self._size > self.max_bytes and len(self._urls) > 1:
+                self._drop(next(iter(self._urls)))
+        return digest
+
+    def _drop(self, url):
+        digest, _ = self._urls.pop(url)
+        body = self._bodies[digest]
+        body[1] -= 1
+        if body[1] == 0:
+            self._size -= len(body[0])
+            del self._bodies[digest]
+
+    def clear(self):
+        with self._lock:
+            self._urls.clear()
+            self._bodies.clear()
+            self._size = 0
+
+
+page_cache = PageCache()
+
+
+def fetch_page(url, timeout=FETCH_TIMEOUT):
+    """
+    Return the HTML of `url`, from the page cache when possible.
+    Raises requests.RequestException on network or HTTP errors.
+    """
+    text = page_cache.get(url)
+    if text is None:
+        started = time.perf_counter()
+        try:
+            resp = http_session().get(url, timeout=timeout)
+            resp.raise_for_status()
+            text = resp.text
+        finally:
+            page_fetched.send(url, seconds=time.perf_counter() - started)
+        page_cache.put(url, text)
+    return text
+
+
+def _first_image(image):
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get("url")
+    return image
+
+
+def _is_recipe(entry):
+    kind = entry.get("@type", "")
+    kinds = kind if isinstance(kind, list) else [kind]
+    return any(str(k).lower() == "recipe" for k in kinds)
+
+
+def _text(value):
+    """A JSON-LD value as stripped text: {"text"/"name": ...} is unwrapped,
+    numbers are spelled out, anything else non-string is ""."""
+    if isinstance(value, dict):
+        value = value.get("text") or value.get("name")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _ingredient_lines(raw):
+    """recipeIngredient (a string, or lists of strings and objects) as lines."""
+    if not isinstance(raw, list):
+        raw = [raw]
+    lines = []
+    for item in raw:
+        if isinstance(item, list):
+            lines.extend(_ingredient_lines(item))
+        elif _text(item):
+            lines.append(_text(item))
+    return lines
+
+
+def _instruction_steps(raw):
+    """Flatten recipeInstructions (strings, HowToSteps, HowToSections) to text."""
+    steps = []
+    if isinstance(raw, list):
+        for step in raw:
+            if isinstance(step, list):
+                steps.extend(_instruction_steps(step))
+            elif isinstance(step, dict) and step.get("itemListElement"):
+                steps.extend(_instruction_steps(step["itemListElement"]))
+            elif _text(step):
+                steps.append(_text(step))
+    elif isinstance(raw, dict):
+        steps.extend(_instruction_steps([raw]))
+    elif raw:
+        # a single string: split on sentences
+        for sentence in str(raw).split(". "):
+            s = sentence.strip()
+            if s:
+                if not s.endswith("."):
+                    s += "."
+                steps.append(s)
+    return steps
+
+
+def parse_jsonld(soup):
+    """
+    Extract Schema.org JSON-LD Recipe data from a parsed page.
+    Returns a dict {title, image, ingredients: [str], instructions: [str],
+    yield} or None.
+    """
     for tag in soup.find_all("script", type="application/ld+json"):
         try:
             data = json.loads(tag.string)
@@ -24,58 +216,157 @@ def extract_jsonld_recipe(url, timeout=10):
             continue
 
         entries = data if isinstance(data, list) else [data]
+        # some sites wrap everything in an @graph
+        entries = [
+            item
+            for entry in entries if isinstance(entry, dict)
+            for item in (entry.get("@graph") or [entry]) if isinstance(item, dict)
+        ]
         for entry in entries:
-            if entry.get("@type", "").lower() == "recipe":
-                # Normalize instructions to a flat list of strings
-                instrs = entry.get("recipeInstructions", [])
-                steps = []
-                for step in instrs:
-                    if isinstance(step, dict) and "text" in step:
-                        steps.append(step["text"])
-                    elif isinstance(step, str):
-                        steps.append(step)
+            if _is_recipe(entry):
                 return {
-                    "title": entry.get("name", ""),
-                    "ingredients": entry.get("recipeIngredient", []),
-                    "instructions": steps,
-                    "image": entry.get("image"),
+                    "title": _text(entry.get("name")),
+                    "image": _first_image(entry.get("image")),
+                    "ingredients": _ingredient_lines(entry.get("recipeIngredient", [])),
+                    "instructions": _instruction_steps(
+                        entry.get("recipeInstructions", [])
+                    ),
                     "yield": entry.get("recipeYield")
                 }
     return None
 
-def scrape_recipe(url):
+
+def parse_with_scrapers(html, url):
     """
-    Use recipe-scrapers as a fallback to pull title, ingredients, and instructions.
+    Use recipe-scrapers on already-fetched HTML as a fallback.
     Returns the same shape dict or None on failure.
     """
+    from recipe_scrapers import scrape_html
+
     try:
-        scraper = scrape_me(url)
+        scraper = scrape_html(html, org_url=url)
         instr = scraper.instructions()
         # often a single string with newlines
         instr_list = instr.split("\n") if instr else []
+        try:
+            image = scraper.image()
+        except Exception:
+            image = None
         return {
             "title": scraper.title() or "",
+            "image": image,
             "ingredients": scraper.ingredients() or [],
             "instructions": [step for step in instr_list if step.strip()]
         }
     except Exception:
         return None
 
-def fetch_opengraph_metadata(url):
+
+def parse_opengraph(soup, url):
+    og_title = soup.find("meta", property="og:title")
+    og_image = soup.find("meta", property="og:image")
+    og_desc  = soup.find("meta", property="og:description")
+
+    return {
+        "title": og_title["content"] if og_title else "",
+        "image": og_image["content"] if og_image else "",
+        "description": og_desc["content"] if og_desc else "",
+        "url": url
+    }
+
+
+def import_recipe(url):
+    """
+    Fetch `url` once and extract a recipe from it, trying JSON-LD, then
+    recipe-scrapers, then OpenGraph. Returns a dict {title, image,
+    ingredients, instructions, source} or None if the page could not be
+    fetched or has nothing usable.
+    """
+    import requests
+    from bs4 import BeautifulSoup
+
     try:
-        response = requests.get(url, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        html = fetch_page(url)
+    except requests.RequestException:
+        return None
 
-        og_title = soup.find("meta", property="og:title")
-        og_image = soup.find("meta", property="og:image")
-        og_desc = soup.find("meta", property="og:description")
+    soup = BeautifulSoup(html, "html.parser")
+    data = parse_jsonld(soup)
+    source = "jsonld"
+    if not data or not data["ingredients"]:
+        scraped = parse_with_scrapers(html, url)
+        if scraped:
+            data, source = scraped, "scrapers"
+    if not data:
+        og = parse_opengraph(soup, url)
+        if not og["title"]:
+            return None
+        data = {"title": og["title"], "image": og["image"],
+                "ingredients": [], "instructions": []}
+        source = "opengraph"
 
-        return {
-            "title": og_title["content"] if og_title else "",
-            "image": og_image["content"] if og_image else "",
-            "description": og_desc["content"] if og_desc else "",
-            "url": url
-        }
-    except Exception as e:
+    return {
+        "title": data.get("title", ""),
+        "image": data.get("image") or None,
+        "ingredients": data.get("ingredients", []),
+        "instructions": data.get("instructions", []),
+        "source": source
+    }
+
+
+def import_many(urls, max_workers=IMPORT_WORKERS):
+    """
+    Import several URLs concurrently through a bounded thread pool sharing
+    the pooled session and page cache. Returns [(url, recipe or None)] in
+    input order; duplicate URLs are fetched once.
+    """
+    unique = list(dict.fromkeys(urls))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = dict(zip(unique, pool.map(_import_or_none, unique)))
+    return [(url, results[url]) for url in urls]
+
+
+def _import_or_none(url):
+    # one malformed page must not abort the whole batch
+    try:
+        return import_recipe(url)
+    except Exception:
+        log.exception("Importing %s failed", url)
+        return None
+
+
+# Single-strategy helpers, kept for callers that want one source only.
+
+def extract_jsonld_recipe(url, timeout=FETCH_TIMEOUT):
+    """Fetch the page and extract Schema.org JSON-LD Recipe data, or None."""
+    import requests
+    from bs4 import BeautifulSoup
+
+    try:
+        html = fetch_page(url, timeout=timeout)
+    except requests.RequestException:
+        return None
+    return parse_jsonld(BeautifulSoup(html, "html.parser"))
+
+
+def scrape_recipe(url):
+    """recipe-scrapers on the (cached) page, or None on failure."""
+    import requests
+
+    try:
+        html = fetch_page(url)
+    except requests.RequestException:
+        return None
+    return parse_with_scrapers(html, url)
+
+
+def fetch_opengraph_metadata(url):
+    import requests
+    from bs4 import BeautifulSoup
+
+    try:
+        html = fetch_page(url)
+    except requests.RequestException as e:
         print(f"Failed to fetch OpenGraph data: {e}")
         return {"title": "", "image": "", "description": "", "url": url}
+    return parse_opengraph(BeautifulSoup(html, "html.parser"), url)